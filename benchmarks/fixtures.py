@@ -0,0 +1,374 @@
+import io
+import re
+import json
+import time
+import base64
+import random
+import pikepdf
+from types import SimpleNamespace
+from datetime import date, datetime, timedelta
+from typing import Any, Dict, Iterator, List, Optional, Tuple
+from pikepdf import Array, Dictionary, Name
+from domain.category_rule import CategoryRule
+from domain.email_config import EmailConfig, field_parser_adapter
+
+# === Synthetic statements ===
+
+MERCHANTS = [
+    "UPI/SWIGGY/FOOD", "UPI/ZOMATO/FOOD", "AMAZON PAY INDIA", "UBER INDIA", "IRCTC TICKETS",
+    "NETFLIX SUBSCRIPTION", "FLIPKART INTERNET", "BIGBASKET GROCERY", "NEFT SALARY ACME CORP",
+    "ATM WDL MG ROAD", "ELECTRICITY BILL BESCOM", "AIRTEL POSTPAID", "HDFC MF SIP",
+]
+
+PAGE_HEIGHT = 792
+LINE_HEIGHT = 11
+TOP_MARGIN = 760
+FONT_SIZE = 8
+# x positions of the bank statement amount columns
+WITHDRAWAL_X = 330
+DEPOSIT_X = 410
+BALANCE_X = 490
+# pdfplumber's default x_density: points per character of layout text
+LAYOUT_X_DENSITY = 7.25
+BANK_HEADER = [(40, "Txn Date"), (100, "Narration"), (WITHDRAWAL_X, "Withdrawal"), (DEPOSIT_X, "Deposit"), (BALANCE_X, "Balance")]
+
+
+def _page_stream(lines: List[List[Tuple[int, str]]]) -> bytes:
+    ops = ["BT", f"/F1 {FONT_SIZE} Tf"]
+    y = TOP_MARGIN
+    for cells in lines:
+        for x, text in cells:
+            escaped = text.replace("\\", "\\\\").replace("(", "\\(").replace(")", "\\)")
+            ops.append(f"1 0 0 1 {x} {y} Tm ({escaped}) Tj")
+        y -= LINE_HEIGHT
+    ops.append("ET")
+    return "\n".join(ops).encode()
+
+
+def build_pdf(pages: List[List[List[Tuple[int, str]]]], password: Optional[str] = None) -> bytes:
+    """Writes pages of positioned text lines (lists of (x, text) cells) into a PDF, optionally encrypted."""
+    pdf = pikepdf.new()
+    font = pdf.make_indirect(Dictionary(Type=Name.Font, Subtype=Name.Type1, BaseFont=Name.Helvetica))
+    for lines in pages:
+        pdf.pages.append(pikepdf.Page(Dictionary(
+            Type=Name.Page,
+            MediaBox=Array([0, 0, 612, PAGE_HEIGHT]),
+            Resources=Dictionary(Font=Dictionary(F1=font)),
+            Contents=pdf.make_stream(_page_stream(lines)),
+        )))
+    output = io.BytesIO()
+    if password:
+        pdf.save(output, encryption=pikepdf.Encryption(owner=password, user=password))
+    else:
+        pdf.save(output)
+    return output.getvalue()
+
+
+def synthetic_transactions(count: int, seed: int = 0, start: date = date(2025, 6, 1)) -> List[dict]:
+    rng = random.Random(seed)
+    transactions = []
+    for i in range(count):
+        credit = rng.random() < 0.2
+        transactions.append({
+            "date": (start + timedelta(days=i * 28 // max(count, 1))).strftime("%Y-%m-%d"),
+            "amount": round(rng.choice([rng.uniform(10, 999), rng.uniform(1000, 50000)]), 2),
+            "note": f"{rng.choice(MERCHANTS)}/{rng.randint(100000, 999999)}",
+            "txn_type": "CREDIT" if credit else "DEBIT",
+        })
+    return transactions
+
+
+def _dmy(iso_date: str) -> str:
+    return datetime.strptime(iso_date, "%Y-%m-%d").strftime("%d/%m/%Y")
+
+
+def synthetic_statement(kind: str, pages: int, rows_per_page: int, seed: int = 0, password: Optional[str] = None) -> Tuple[bytes, List[dict]]:
+    """
+    Builds a bank ("bank": withdrawal/deposit/balance columns, closing balance on page 1) or
+    credit card ("card": amount with Cr/Dr marker, total amount due on page 1) statement.
+    Returns the PDF bytes and the transactions printed in it.
+    """
+    if kind not in ("bank", "card"):
+        raise ValueError(f"Unknown statement kind: {kind}")
+
+    transactions = synthetic_transactions(pages * rows_per_page, seed)
+    # Opening balance large enough that the running balance never goes negative
+    balance = 10000.0 + sum(t["amount"] for t in transactions if t["txn_type"] == "DEBIT")
+    closing_balance = balance + sum(t["amount"] if t["txn_type"] == "CREDIT" else -t["amount"] for t in transactions)
+    total_amount_due = sum(t["amount"] if t["txn_type"] == "DEBIT" else -t["amount"] for t in transactions)
+    page_lines = []
+    for page_number in range(pages):
+        lines = [
+            [(40, "ACME BANK LIMITED" if kind == "bank" else "ACME BANK CREDIT CARDS"), (450, f"Page {page_number + 1} of {pages}")],
+            [(40, "Statement period 01/06/2025 - 30/06/2025")],
+        ]
+        if page_number == 0:
+            keyword, summary = ("Closing Balance", closing_balance) if kind == "bank" else ("Total Amount Due", total_amount_due)
+            lines += [[(40, keyword)], [(40, f"{summary:,.2f}")], []]
+        if kind == "bank":
+            lines.append(BANK_HEADER)
+            lines.append([(100, "BALANCE BROUGHT FORWARD"), (BALANCE_X, f"{balance:,.2f}")])
+        else:
+            lines.append([(40, "Txn Date"), (100, "Transaction Details"), (400, "Amount"), (470, "Cr/Dr")])
+
+        for txn in transactions[page_number * rows_per_page:(page_number + 1) * rows_per_page]:
+            amount = f"{txn['amount']:,.2f}"
+            if kind == "bank":
+                balance += txn["amount"] if txn["txn_type"] == "CREDIT" else -txn["amount"]
+                debit, credit = (amount, "") if txn["txn_type"] == "DEBIT" else ("", amount)
+                lines.append([(40, _dmy(txn["date"])), (100, txn["note"]), (WITHDRAWAL_X, debit), (DEPOSIT_X, credit), (BALANCE_X, f"{balance:,.2f}")])
+            else:
+                lines.append([(40, _dmy(txn["date"])), (100, txn["note"]), (400, amount), (470, "Dr" if txn["txn_type"] == "DEBIT" else "Cr")])
+
+        lines += [[], [(40, "This is a computer generated statement and does not require a signature.")]]
+        page_lines.append(lines)
+
+    return build_pdf(page_lines, password), transactions
+
+
+def statement_email_config(kind: str, account_id: str, compaction: bool = False) -> EmailConfig:
+    """Matches the shipped configs, which leave compaction off unless it is asked for."""
+    keyword = "Closing Balance" if kind == "bank" else "Total Amount Due"
+    summary_field = "closing_balance" if kind == "bank" else "total_amount_due"
+    transactions_parser = {
+        "type": "pdf_attachment",
+        "pdf_extractor": {"type": "between", "start": "Txn Date", "end": None},
+        "processor": {"type": "llm"},
+    }
+    if compaction:
+        transactions_parser["compaction"] = {}
+    return EmailConfig(
+        id=account_id,
+        from_addresses=[f"statements@{account_id}.example"],
+        subject_keywords=["statement"],
+        field_parsers={
+            summary_field: field_parser_adapter.validate_python({
+                "type": "pdf_attachment",
+                "pdf_extractor": {"type": "float_near_keyword", "keyword": keyword, "location": "BELOW"},
+                "processor": {"type": "noop"},
+            }),
+            "transactions": field_parser_adapter.validate_python(transactions_parser),
+        },
+        run=True,
+    )
+
+
+def synthetic_category_rules(count: int = 40, seed: int = 0) -> List[CategoryRule]:
+    rng = random.Random(seed)
+    categories = ["REVENUE", "LIVING", "TRAVEL", "FUN", "SHOPPING", "INVESTMENT", "SELF"]
+    rules = []
+    for priority in range(count):
+        merchant = rng.choice(MERCHANTS)
+        rules.append(CategoryRule(
+            priority=priority,
+            txn_type=rng.choice([None, "DEBIT", "CREDIT"]),
+            account_id_contains=rng.choice([None, None, "bank", "card"]),
+            note_contains=rng.choice([None, merchant.split("/")[-1].split()[0]]),
+            regex_note=rng.choice([None, None, rf"{merchant.split()[0]}.*\d{{3}}"]),
+            min_amount=rng.choice([None, 100.0, 1000.0]),
+            max_amount=rng.choice([None, 5000.0, 100000.0]),
+            category=rng.choice(categories),
+        ))
+    return rules
+
+
+# === Offline stand-ins for Gmail, Sheets and the LLM ===
+
+class FakeRequest:
+    def __init__(self, result):
+        self.result = result
+
+    def execute(self, http=None):
+        return self.result() if callable(self.result) else self.result
+
+
+class FakeBatch:
+    def __init__(self, callback):
+        self.callback = callback
+        self.requests = []
+
+    def add(self, request, request_id):
+        self.requests.append((request_id, request))
+
+    def execute(self):
+        for request_id, request in self.requests:
+            self.callback(request_id, request.execute(), None)
+
+
+class FakeGmailService:
+    """In-memory Gmail API covering the calls made by email_service and attachment_service."""
+
+    def __init__(self, history_id: str = "1"):
+        self.messages_by_id: Dict[str, dict] = {}
+        self.attachments_by_id: Dict[Tuple[str, str], bytes] = {}
+        self.history_id = history_id
+
+    def add_statement(self, message_id: str, config: EmailConfig, sent_at: datetime, pdf_bytes: bytes):
+        self.messages_by_id[message_id] = {
+            "id": message_id,
+            "internalDate": str(int(sent_at.timestamp() * 1000)),
+            "payload": {
+                "headers": [
+                    {"name": "From", "value": f"Statements <{config.from_addresses[0]}>"},
+                    {"name": "Subject", "value": f"Your {config.id} statement"},
+                    {"name": "Date", "value": sent_at.strftime("%a, %d %b %Y %H:%M:%S +0530")},
+                ],
+                "parts": [{"filename": f"{message_id}.pdf", "body": {"attachmentId": f"att-{message_id}"}}],
+            },
+        }
+        self.attachments_by_id[(message_id, f"att-{message_id}")] = pdf_bytes
+
+    def new_batch_http_request(self, callback):
+        return FakeBatch(callback)
+
+    def users(self):
+        return self
+
+    def messages(self):
+        return self
+
+    def attachments(self):
+        return SimpleNamespace(get=lambda userId, messageId, id: FakeRequest({
+            "data": base64.urlsafe_b64encode(self.attachments_by_id[(messageId, id)]).decode()
+        }))
+
+    def getProfile(self, userId):
+        return FakeRequest({"historyId": self.history_id})
+
+    def list(self, userId, q=None, maxResults=100, pageToken=None, **kwargs):
+        ids = sorted(self.messages_by_id)
+        start = int(pageToken or 0)
+        response = {"messages": [{"id": message_id} for message_id in ids[start:start + maxResults]]}
+        if start + maxResults < len(ids):
+            response["nextPageToken"] = str(start + maxResults)
+        return FakeRequest(response)
+
+    def get(self, userId, id, format="full", metadataHeaders=None):
+        message = self.messages_by_id[id]
+        if format == "metadata":
+            headers = [h for h in message["payload"]["headers"] if h["name"] in (metadataHeaders or [])]
+            return FakeRequest({"id": id, "internalDate": message["internalDate"], "payload": {"headers": headers}})
+        return FakeRequest(message)
+
+
+class FakeWorksheet:
+    def __init__(self):
+        self.rows: List[List[Any]] = []
+
+    def append_rows(self, rows, value_input_option=None):
+        self.rows.extend(rows)
+
+    def append_row(self, row, value_input_option=None):
+        self.rows.append(row)
+
+
+def fake_sheet_service():
+    """A SheetService whose worksheets are in memory, so its row builders run without Google Sheets."""
+    from modules.sheet_service import SheetService
+
+    service = SheetService.__new__(SheetService)
+    for name in ("transaction_sheet", "status_sheet", "balances_sheet", "execution_log_sheet", "category_rules_sheet"):
+        setattr(service, name, FakeWorksheet())
+    return service
+
+
+# Rows as they look in layout text
+ROW_REGEX = re.compile(
+    r"(?P<date>\d{2}/\d{2}/\d{4})\s+(?P<note>\S.*?)\s+(?P<amount>[\d,]+\.\d{2})\s+(?P<last>[\d,]+\.\d{2}|Cr|Dr)\s*$"
+)
+DATE_REGEX = re.compile(r"\d{2}/\d{2}/\d{4}")
+# In layout text a deposit starts closer to the balance than this many characters, a withdrawal further
+DEPOSIT_MAX_CHARS_BEFORE_BALANCE = (BALANCE_X - (WITHDRAWAL_X + DEPOSIT_X) / 2) / LAYOUT_X_DENSITY
+COMPACTED_DELIMITER = " | "
+
+
+def layout_row(line: str) -> Optional[dict]:
+    """Reads a row of layout text; a bank row's type comes from how far its amount starts from the balance."""
+    match = ROW_REGEX.match(line.strip())
+    if not match:
+        return None
+    if match["last"] in ("Cr", "Dr"):
+        txn_type = "CREDIT" if match["last"] == "Cr" else "DEBIT"
+    else:
+        distance = match.start("last") - match.start("amount")
+        txn_type = "DEBIT" if distance > DEPOSIT_MAX_CHARS_BEFORE_BALANCE else "CREDIT"
+    return {"date": match["date"], "note": match["note"], "amount": match["amount"], "txn_type": txn_type}
+
+
+def compacted_row(cells: List[str], header: List[str]) -> Optional[dict]:
+    """Reads a row of compacted text; a bank row's type is the header cell above its amount."""
+    if len(cells) < 4 or not DATE_REGEX.fullmatch(cells[0]):
+        return None
+    if cells[-1] in ("Cr", "Dr"):
+        amount, txn_type = cells[2], "CREDIT" if cells[-1] == "Cr" else "DEBIT"
+    else:
+        # The balance is the last cell, the amount the one filled cell between it and the note
+        column = next((i for i in range(2, len(cells) - 1) if cells[i]), None)
+        if column is None or column >= len(header) or header[column] not in ("Withdrawal", "Deposit"):
+            return None
+        amount, txn_type = cells[column], "DEBIT" if header[column] == "Withdrawal" else "CREDIT"
+    return {"date": cells[0], "note": cells[1], "amount": amount, "txn_type": txn_type}
+
+
+def fake_llm_output(input_query: str) -> str:
+    """
+    Answers a transactions request by reading the rows back out of the synthetic statement text,
+    by position as a model would: card rows carry a Cr/Dr marker, bank rows are typed by the
+    column their amount is in.
+    """
+    transactions = []
+    # The later pieces of a split page carry no column header
+    header = [text for _, text in BANK_HEADER]
+    for line in input_query.split("\n"):
+        if COMPACTED_DELIMITER in line:
+            cells = line.split(COMPACTED_DELIMITER)
+            if "Withdrawal" in cells and "Deposit" in cells:
+                header = cells
+                continue
+            row = compacted_row(cells, header)
+        else:
+            row = layout_row(line)
+        if row is None:
+            continue
+        transactions.append({
+            "date": datetime.strptime(row["date"], "%d/%m/%Y").strftime("%Y-%m-%d"),
+            "amount": float(row["amount"].replace(",", "")),
+            "txn_type": row["txn_type"],
+            "note": row["note"],
+            "reason": "Read from the synthetic statement row",
+        })
+    return json.dumps({"transactions": transactions, "confidence": 0.95})
+
+
+class FakeLLMRunner:
+    """Stands in for LLMRunner; latency is slept once per batch of requests, as the runner sends a batch concurrently."""
+
+    def __init__(self, latency: float = 0.0):
+        self.latency = latency
+        self.requests = 0
+
+    def create_responses(self, model, system_message, schema, schema_name, input_queries: List[str]) -> List[Any]:
+        self.requests += len(input_queries)
+        if self.latency:
+            time.sleep(self.latency)
+        return [SimpleNamespace(output_text=fake_llm_output(input_query)) for input_query in input_queries]
+
+    def stream_responses(self, model, system_message, schema, schema_name, input_queries: List[str]) -> Iterator[Tuple[int, str]]:
+        for index, response in enumerate(self.create_responses(model, system_message, schema, schema_name, input_queries)):
+            for start in range(0, len(response.output_text), 64):
+                yield index, response.output_text[start:start + 64]
+
+
+class ApproximateEncoding:
+    """Stands in for the tiktoken encoding, which is downloaded on first use; about four characters per token."""
+
+    def encode(self, text: str, **kwargs) -> range:
+        return range(0, len(text), 4)
+
+
+class NullLLMCache:
+    def get(self, key):
+        return None
+
+    def put(self, key, output_text):
+        pass
@@ -0,0 +1,284 @@
+"""
+Offline benchmarks for the parsing pipeline.
+
+Every stage runs on synthetic statements with in-memory Gmail, Sheets and LLM stand-ins,
+so no credentials or network are needed; token counts are approximated unless --tiktoken is
+given, which downloads the real encoding on first use. Each stage reports the best wall time over
+--repeat runs, the peak Python heap (tracemalloc, measured on one extra run) and rows/sec.
+
+    python -m benchmarks.run --pages 20 --rows 40 --save benchmarks/baselines/main.json
+    python -m benchmarks.run --pages 20 --rows 40 --compare benchmarks/baselines/main.json
+
+Memory allocated by PDF worker processes is not seen by tracemalloc.
+"""
+import io
+import sys
+import json
+import time
+import argparse
+import subprocess
+import tracemalloc
+from contextlib import ExitStack, redirect_stdout
+from datetime import date, datetime
+from typing import Callable, Dict, List, Tuple
+from unittest import mock
+
+from benchmarks.fixtures import (
+    ApproximateEncoding, FakeGmailService, FakeLLMRunner, NullLLMCache, fake_sheet_service,
+    statement_email_config, synthetic_category_rules, synthetic_statement, synthetic_transactions,
+)
+from domain.field_parser_config import (
+    BetweenPDFExtractorConfig, FloatNearKeywordPDFExtractorConfig,
+    LayoutCompactionConfig, TransactionsProcessorUsingLLMConfig,
+)
+from domain.parsed_email import ParsedEmail
+from domain.transaction import Transaction
+from modules.email_parser_service import parse_emails
+from modules.email_service import get_matching_emails
+from modules.field_parser.compactor import compact_extracted_content
+from modules.field_parser.extractor import extract_from_pdf
+from modules.field_parser.field_parser_utils import populate_alignment_scores
+from modules.field_parser.line_aligner import LineAligner
+from modules.field_parser.pdf_document import PDFDocument
+from modules.field_parser.processor import process_field
+from modules.post_processor import PostProcessor
+
+BENCHMARK_PASSWORD = "benchmark"
+BETWEEN_CONFIG = BetweenPDFExtractorConfig(type="between", start="Txn Date", end=None)
+
+# A stage prepares its fixtures untimed and returns the work to time plus the rows it handles
+Stage = Callable[[argparse.Namespace], Tuple[Callable[[], object], int]]
+
+
+def to_transactions(rows: List[dict]) -> List[Transaction]:
+    return [Transaction(**row, reason="synthetic", category="MISC") for row in rows]
+
+
+def stage_extract_between(args):
+    pdf_bytes, rows = synthetic_statement(args.kind, args.pages, args.rows)
+
+    def run():
+        with PDFDocument(pdf_bytes) as document:
+            return extract_from_pdf(BETWEEN_CONFIG, document)
+    return run, len(rows)
+
+
+def stage_extract_float_near_keyword(args):
+    pdf_bytes, rows = synthetic_statement(args.kind, args.pages, args.rows)
+    keyword = "Closing Balance" if args.kind == "bank" else "Total Amount Due"
+    config = FloatNearKeywordPDFExtractorConfig(type="float_near_keyword", keyword=keyword, location="BELOW")
+
+    def run():
+        with PDFDocument(pdf_bytes) as document:
+            return extract_from_pdf(config, document)
+    return run, len(rows)
+
+
+def stage_compaction(args):
+    """Extraction plus compaction, which reads the word positions of every extracted page."""
+    pdf_bytes, rows = synthetic_statement(args.kind, args.pages, args.rows)
+
+    def run():
+        with PDFDocument(pdf_bytes) as document:
+            return compact_extracted_content(LayoutCompactionConfig(), extract_from_pdf(BETWEEN_CONFIG, document), document)
+    return run, len(rows)
+
+
+def stage_llm_processor(args):
+    pdf_bytes, rows = synthetic_statement(args.kind, args.pages, args.rows)
+    with PDFDocument(pdf_bytes) as document:
+        pages = extract_from_pdf(BETWEEN_CONFIG, document)
+    config = TransactionsProcessorUsingLLMConfig(type="llm", stream=args.stream)
+    return (lambda: process_field(config, "transactions", pages)), len(rows)
+
+
+def stage_alignment(args):
+    pdf_bytes, rows = synthetic_statement(args.kind, args.pages, args.rows)
+    with PDFDocument(pdf_bytes) as document:
+        lines = document.lines()
+    return (lambda: populate_alignment_scores(LineAligner(lines), to_transactions(rows))), len(rows)
+
+
+def synthetic_parsed_emails(args) -> List[ParsedEmail]:
+    return [
+        ParsedEmail(
+            execution_id="benchmark",
+            message_id=f"m{i:05d}",
+            email_date="2025-06-30",
+            account_id=f"{args.kind}_{i % 3}",
+            transactions=to_transactions(synthetic_transactions(args.pages * args.rows, seed=i)),
+            status="success",
+        )
+        for i in range(args.emails)
+    ]
+
+
+def stage_post_processor(args):
+    parsed_emails = synthetic_parsed_emails(args)
+    post_processor = PostProcessor(synthetic_category_rules())
+    rows = sum(len(email.transactions) for email in parsed_emails)
+    return (lambda: post_processor.process_all(parsed_emails)), rows
+
+
+def stage_sheet_rows(args):
+    parsed_emails = synthetic_parsed_emails(args)
+    rows = sum(len(email.transactions) for email in parsed_emails)
+
+    def run():
+        sheet_service = fake_sheet_service()
+        sheet_service.write_all_outputs(parsed_emails, [])
+        return sheet_service
+    return run, rows
+
+
+def stage_pipeline(args):
+    """Gmail listing, PDF download and unlock, extraction, LLM, alignment, categorization and sheet rows."""
+    gmail = FakeGmailService()
+    email_configs = [statement_email_config(args.kind, f"{args.kind}_{i}", args.compaction) for i in range(3)]
+    expected = {}
+    for i in range(args.emails):
+        pdf_bytes, statement_rows = synthetic_statement(args.kind, args.pages, args.rows, seed=i, password=BENCHMARK_PASSWORD)
+        gmail.add_statement(f"m{i:05d}", email_configs[i % 3], datetime(2025, 6, 1 + i % 28, 10), pdf_bytes)
+        expected[f"m{i:05d}"] = sorted((row["date"], row["amount"], row["txn_type"]) for row in statement_rows)
+    rows = sum(len(statement_rows) for statement_rows in expected.values())
+    post_processor = PostProcessor(synthetic_category_rules())
+
+    def run():
+        emails = get_matching_emails(gmail, email_configs, date(2025, 6, 1), date(2025, 7, 1))
+        parsed_emails = parse_emails(emails, gmail, "benchmark", service_factory=lambda: gmail)
+        failed = [email.script_message for email in parsed_emails if email.status != "success"]
+        if failed:
+            raise RuntimeError(f"Pipeline benchmark failed to parse an email: {failed[0]}")
+        for email in parsed_emails:
+            if sorted((t.date, t.amount, t.txn_type) for t in email.transactions) != expected[email.message_id]:
+                raise RuntimeError(f"Pipeline benchmark parsed different transactions for {email.message_id}")
+        fake_sheet_service().write_all_outputs(post_processor.process_all(parsed_emails), [])
+    return run, rows
+
+
+STAGES: Dict[str, Stage] = {
+    "extract_between": stage_extract_between,
+    "extract_float_near_keyword": stage_extract_float_near_keyword,
+    "compaction": stage_compaction,
+    "llm_processor": stage_llm_processor,
+    "alignment": stage_alignment,
+    "post_processor": stage_post_processor,
+    "sheet_rows": stage_sheet_rows,
+    "pipeline": stage_pipeline,
+}
+
+
+def measure(run: Callable[[], object], rows: int, repeat: int) -> dict:
+    timings = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        run()
+        timings.append(time.perf_counter() - started)
+
+    tracemalloc.start()
+    try:
+        run()
+        _, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+
+    seconds = min(timings)
+    return {
+        "seconds": round(seconds, 6),
+        "peak_mib": round(peak / 2 ** 20, 3),
+        "rows": rows,
+        "rows_per_sec": round(rows / seconds, 1) if seconds else None,
+    }
+
+
+def offline_stand_ins(args) -> ExitStack:
+    stack = ExitStack()
+    runner = FakeLLMRunner(args.llm_latency)
+    stack.enter_context(mock.patch("modules.field_parser.processor.get_llm_runner", lambda: runner))
+    stack.enter_context(mock.patch("modules.field_parser.processor.get_llm_response_cache", lambda: NullLLMCache()))
+    stack.enter_context(mock.patch("modules.field_parser.processor.append_eval_jsonl", lambda *a, **k: None))
+    stack.enter_context(mock.patch("modules.attachment_service.get_pdf_password", lambda account_id: BENCHMARK_PASSWORD))
+    if not args.tiktoken:
+        encoding = ApproximateEncoding()
+        stack.enter_context(mock.patch("tiktoken.encoding_for_model", lambda model: encoding))
+    return stack
+
+
+def git_commit() -> str:
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return "unknown"
+
+
+def compare(results: dict, baseline: dict, threshold: float) -> List[str]:
+    """Prints the change against a saved baseline and returns the stages that regressed."""
+    regressions = []
+    print(f"\nCompared with {baseline['commit']} ({baseline['created_at']}):")
+    for name, current in results["stages"].items():
+        previous = baseline["stages"].get(name)
+        if previous is None:
+            print(f"  {name:<28} no baseline")
+            continue
+        changes = []
+        for metric in ("seconds", "peak_mib"):
+            if previous[metric]:
+                change = (current[metric] - previous[metric]) / previous[metric]
+                changes.append(f"{metric} {change:+.1%}")
+                if change > threshold:
+                    regressions.append(f"{name} {metric}")
+        print(f"  {name:<28} " + ", ".join(changes))
+    return regressions
+
+
+def main(argv: List[str] = None) -> int:
+    parser = argparse.ArgumentParser(description="Offline benchmarks for the parsing pipeline")
+    parser.add_argument("--stages", nargs="+", choices=list(STAGES), default=list(STAGES))
+    parser.add_argument("--kind", choices=["bank", "card"], default="card")
+    parser.add_argument("--pages", type=int, default=10, help="pages per statement")
+    parser.add_argument("--rows", type=int, default=40, help="transaction rows per page")
+    parser.add_argument("--emails", type=int, default=12, help="statements for the pipeline, post processor and sheet stages")
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--llm-latency", type=float, default=0.0, help="seconds the fake LLM sleeps per batch of requests")
+    parser.add_argument("--stream", action="store_true", help="use the streaming LLM processor")
+    parser.add_argument("--compaction", action="store_true", help="turn on layout compaction in the pipeline stage (off in the shipped configs)")
+    parser.add_argument("--tiktoken", action="store_true", help="count tokens with tiktoken (downloads the encoding) instead of approximating")
+    parser.add_argument("--save", help="write the results to this JSON file")
+    parser.add_argument("--compare", help="compare against results saved with --save")
+    parser.add_argument("--threshold", type=float, default=0.10, help="relative slowdown or growth reported as a regression")
+    args = parser.parse_args(argv)
+
+    results = {
+        "commit": git_commit(),
+        "created_at": datetime.now().isoformat(timespec="seconds"),
+        "params": {key: getattr(args, key) for key in ("kind", "pages", "rows", "emails", "repeat", "llm_latency", "stream", "compaction", "tiktoken")},
+        "stages": {},
+    }
+    print(f"{'stage':<28} {'seconds':>10} {'peak MiB':>10} {'rows':>8} {'rows/sec':>12}")
+    with offline_stand_ins(args):
+        for name in args.stages:
+            run, rows = STAGES[name](args)
+            with redirect_stdout(io.StringIO()):
+                stats = measure(run, rows, args.repeat)
+            results["stages"][name] = stats
+            print(f"{name:<28} {stats['seconds']:>10.4f} {stats['peak_mib']:>10.2f} {rows:>8} {stats['rows_per_sec'] or 0:>12.1f}")
+
+    if args.save:
+        with open(args.save, "w", encoding="utf-8") as f:
+            json.dump(results, f, indent=2)
+        print(f"\nSaved results to {args.save}")
+
+    if args.compare:
+        with open(args.compare, "r", encoding="utf-8") as f:
+            baseline = json.load(f)
+        if baseline["params"] != results["params"]:
+            print(f"⚠️ Baseline was recorded with different parameters: {baseline['params']}")
+        regressions = compare(results, baseline, args.threshold)
+        if regressions:
+            print(f"❌ Regressions above {args.threshold:.0%}: {', '.join(regressions)}")
+            return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -1,24 +1,51 @@
+import os
 from typing import Literal
 
 # properties based on paths.
 EMAIL_CONFIGS_PATH = 'config/email_configs.json'
 PDF_OUTPUT_DIRECTORY = 'output_pdfs'
+SAVE_UNLOCKED_PDFS = False      # keep a decrypted copy of every statement in PDF_OUTPUT_DIRECTORY, reused by later runs
 STATE_FILE = 'state/state.json'
 PDF_PASSWORDS_PATH = 'creds/pdf_passwords.json'
 JSONL_EVAL_PATH = "evals/current.jsonl"
+GMAIL_CACHE_DIRECTORY = 'cache/gmail'
+GMAIL_CACHE_MAX_BYTES = 1024 * 1024 * 1024
+EXTRACTION_CACHE_DIRECTORY = 'cache/extraction'
+USE_EXTRACTION_CACHE = False    # keep decrypted statement text and word boxes in EXTRACTION_CACHE_DIRECTORY between runs
+EXTRACTION_CACHE_MAX_BYTES = 256 * 1024 * 1024
+
+# PDF extraction
+PDF_EXTRACTION_WORKERS = os.cpu_count() or 1
+PDF_PARALLEL_MIN_PAGES = 8      # smaller documents are parsed serially, process start-up is not worth it
+PDF_STREAM_PAGES_PER_WORKER = 4 # look-ahead per worker when streaming pages in parallel
+EMAIL_PARSE_WORKERS = 4         # emails parsed concurrently, mostly waiting on the LLM
+
+# LLM limits, shared by every request of a run
+LLM_MAX_CONCURRENCY = 8
+LLM_TOKENS_PER_MINUTE = 200000
+LLM_CACHE_PATH = 'cache/llm_responses.sqlite3'
+LLM_CACHE_TTL_SECONDS = 90 * 24 * 60 * 60
+LLM_CACHE_MAX_BYTES = 256 * 1024 * 1024
 
 # GMAIL constants
 GMAIL_SCOPES = ['https://www.googleapis.com/auth/gmail.readonly']
 GMAIL_CREDENTIALS_PATH = 'creds/credentials.json'
 GMAIL_TOKEN_PATH = 'creds/token.json'
+GMAIL_LIST_PAGE_SIZE = 500      # max allowed by messages.list
+GMAIL_BATCH_SIZE = 50           # Gmail recommends at most 50 calls per batch request
+GMAIL_BATCH_MAX_RETRIES = 3
+GMAIL_METADATA_HEADERS = ['From', 'Subject', 'Date']
+ATTACHMENT_WORKERS = 8
 
 # Google Sheets constants
 SHEETS_SERVICE_ACCOUNT_FILE = 'creds/service_account.json'
 SHEETS_SCOPES = ['https://www.googleapis.com/auth/spreadsheets']
 SHEETS_SPREADSHEET_ID = '1sjJ0ip3VW6tHsqLpWHafgVf9SjXM60ccYjMC-gI8M6c'
+SHEETS_BATCH_UPDATE_RANGES = 1000  # Ranges sent per values.batchUpdate call when re-categorizing
 
 # constants which there should be no need to change
 OPEN_AI_API_KEY = 'OPEN_AI_API_KEY'
+OPEN_AI_BASE_URL = 'OPEN_AI_BASE_URL'
 EMAIL_CONFIGS = 'email_configs'
 DATE_FORMAT = '%Y-%m-%d'
 
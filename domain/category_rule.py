@@ -1,3 +1,4 @@
+import re
 from pydantic import BaseModel, Field
 from typing import Optional
 from constants import CategoryType, TransactionType
@@ -23,7 +24,6 @@ class CategoryRule(BaseModel):
             return False
         if self.regex_note:
             try:
-                import re
                 if not re.search(self.regex_note, transaction.note, re.IGNORECASE):
                     return False
             except re.error:
@@ -1,33 +1,61 @@
+from datetime import datetime
+from typing import Optional, Tuple
 from domain.email_config import EmailConfig
 from email.utils import parsedate_to_datetime
 
 class Email:
+    # Headers and attachment parts are parsed once up front; the raw Gmail payload is
+    # not kept so that large batches of emails stay small in memory.
+    __slots__ = ("config", "message_id", "from_header", "subject", "sent_at", "attachments", "_date_error", "_email_date", "_filename_prefix")
+
     def __init__(self, config: EmailConfig, message: dict):
         self.config = config
-        self.message = message
+        self.message_id = str(message.get("id"))
+
+        payload = message.get("payload", {})
+        headers = {}
+        for h in payload.get("headers", []):
+            headers.setdefault(h["name"].lower(), h["value"])
+        self.from_header: str = headers.get("from", "")
+        self.subject: str = headers.get("subject", "")
+
+        # (filename, attachmentId) of every attachment part, in payload order
+        self.attachments: Tuple[Tuple[str, Optional[str]], ...] = tuple(
+            (part.get("filename", ""), part.get("body", {}).get("attachmentId"))
+            for part in payload.get("parts", [])
+            if part.get("filename")
+        )
+
+        self.sent_at: Optional[datetime] = None
+        self._date_error: Optional[str] = None
+        self._email_date: Optional[str] = None
+        self._filename_prefix: Optional[str] = None
+        date_header = headers.get("date")
+        if not date_header:
+            self._date_error = f"Email {self.message_id} is missing a Date header"
+        else:
+            try:
+                # This is the robust, RFC-compliant parser
+                self.sent_at = parsedate_to_datetime(date_header)
+                self._email_date = self.sent_at.strftime("%Y-%m-%d")
+                self._filename_prefix = f"{config.id}_{self._email_date}"
+            except Exception as e:
+                self._date_error = f"Failed to parse date for email {self.message_id}: {e}"
 
     def get_message_id(self) -> str:
-        return str(self.message.get("id"))
+        return self.message_id
 
     def get_email_date(self) -> str:
-        headers = self.message.get("payload", {}).get("headers", [])
-        date_header = next((h["value"] for h in headers if h["name"].lower() == "date"), None)
-        if not date_header:
-            raise ValueError(f"Email {self.get_message_id()} is missing a Date header")
-
-        try:
-            # This is the robust, RFC-compliant parser
-            parsed = parsedate_to_datetime(date_header)
-            return parsed.strftime("%Y-%m-%d")
-        except Exception as e:
-            raise ValueError(f"Failed to parse date for email {self.get_message_id()}: {e}")
+        if self._email_date is None:
+            raise ValueError(self._date_error)
+        return self._email_date
 
     def get_filename_prefix(self) -> str:
-        return f"{self.config.id}_{self.get_email_date()}"
+        if self._filename_prefix is None:
+            raise ValueError(self._date_error)
+        return self._filename_prefix
 
     def __lt__(self, other: "Email") -> bool:
         if not isinstance(other, Email):
             return NotImplemented
         return self.get_filename_prefix() < other.get_filename_prefix()
-
-
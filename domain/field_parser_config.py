@@ -1,5 +1,5 @@
 from pydantic import BaseModel, Field
-from typing import Literal, Annotated, Union, Optional
+from typing import Literal, Annotated, Union, Optional, List
 
 
 # === Extractor Config Models ===
@@ -7,6 +7,9 @@ class BetweenPDFExtractorConfig(BaseModel):
     type: Literal["between"]
     start: str
     end: Optional[str]
+    stop_at_end: bool = True     # stop reading pages once the end marker is found
+    first_page: int = 0          # pages before this one are never parsed
+    skip_to_start: bool = False  # pages before the first one whose plain text has the start marker are not layout-parsed
 
 
 class FloatNearKeywordPDFExtractorConfig(BaseModel):
@@ -23,6 +26,38 @@ class NOOPProcessorConfig(BaseModel):
 class TransactionsProcessorUsingLLMConfig(BaseModel):
     type: Literal["llm"]
     model: str = "gpt-4.1-mini"
+    # Pages are packed together or split on line boundaries to fit this many input tokens per request
+    max_input_tokens: int = 3000
+    # Lines repeated across the seam when a page has to be split
+    split_overlap_lines: int = 2
+    # Consume the response event stream and hand over each transaction as soon as it is complete
+    stream: bool = False
+
+
+class TieredTransactionsProcessorUsingLLMConfig(BaseModel):
+    type: Literal["tiered_llm"]
+    small_model: str = "gpt-4.1-nano"
+    large_model: str = "gpt-4.1-mini"
+    # A request is re-run on large_model when the small model's confidence or the
+    # average alignment score of its transactions against its own input falls below these
+    min_confidence: float = 0.9
+    min_alignment_score: float = 0.5
+    max_input_tokens: int = 3000
+    split_overlap_lines: int = 2
+
+
+class TransactionsProcessorUsingLayoutConfig(BaseModel):
+    type: Literal["layout"]
+    # Matched against every line; named groups `date` and `note`, plus either `amount`
+    # (with an optional `txn_type` credit/debit marker) or separate `debit` / `credit` columns
+    row_pattern: str
+    date_formats: List[str] = ["%d/%m/%Y"]
+    credit_markers: List[str] = ["CR"]
+    # Lines matching this are expected to be rows; if one fails row_pattern the page falls back.
+    # The default takes any line starting with a date (01/06/2025, 1-Jun-25, 2025-06-01, ...) for a row
+    row_start_pattern: Optional[str] = r"\d{1,2}[/\-. ](?:\d{1,2}|[A-Za-z]{3,9})[/\-. ]\d{2,4}\b|\d{4}-\d{2}-\d{2}\b"
+    # Pages with unparseable rows go to this processor, None makes them an error instead
+    fallback: Optional[TransactionsProcessorUsingLLMConfig] = TransactionsProcessorUsingLLMConfig(type="llm")
 
 
 PDFExtractorConfig = Annotated[
@@ -31,14 +66,29 @@ PDFExtractorConfig = Annotated[
 ]
 
 ProcessorConfig = Annotated[
-    Union[NOOPProcessorConfig, TransactionsProcessorUsingLLMConfig],
+    Union[
+        NOOPProcessorConfig,
+        TransactionsProcessorUsingLLMConfig,
+        TieredTransactionsProcessorUsingLLMConfig,
+        TransactionsProcessorUsingLayoutConfig,
+    ],
     Field(discriminator="type"),
 ]
 
 
+# === Post-extraction Config Models ===
+class LayoutCompactionConfig(BaseModel):
+    # Keep only the first of a header/footer line repeated at the top or bottom of several pages
+    drop_repeated_lines: bool = True
+    # Lines matching any of these (cells joined by " | ", without empty cells) are dropped
+    boilerplate_patterns: List[str] = [r"(?i)^page \d+( of \d+)?$"]
+
+
 class PDFFieldParserConfig(BaseModel):
     type: Literal["pdf_attachment"]
     pdf_extractor: PDFExtractorConfig
+    # Shrinks extracted layout text before it reaches the processor
+    compaction: Optional[LayoutCompactionConfig] = None
     processor: ProcessorConfig
 
 
@@ -1,15 +1,23 @@
 import uuid
 from datetime import datetime
-from modules.gmail_auth import get_gmail_service
-from modules.email_service import get_matching_emails
+from modules.gmail_auth import build_gmail_service, get_gmail_credentials
+from modules.email_service import build_query, get_current_history_id, get_matching_emails
+from modules.message_store import MessageStore
+from modules.field_parser.extraction_cache import ExtractionCache
+from modules.sync_state import checkpoint_key, get_history_checkpoint, save_history_checkpoint
 from modules.email_parser_service import parse_emails
 from modules.sheet_service import SheetService
 from modules.post_processor import PostProcessor
+from modules.recategorizer import recategorize_rows
 from utils import load_email_configs, log_and_collect, getStartEndDate
-from constants import EMAIL_CONFIGS_PATH, DATE_FORMAT
+from constants import EMAIL_CONFIGS_PATH, DATE_FORMAT, USE_EXTRACTION_CACHE
 
 YEAR = 2025
 MONTH = 6
+# Only look at messages added since the last successful run for the same window
+INCREMENTAL_SYNC = True
+# Re-apply the category_rules sheet to every row already in the transactions sheet instead of parsing emails
+RECATEGORIZE_HISTORY = False
 
 class EmailParsingPipeline:
     def __init__(self):
@@ -20,10 +28,17 @@ class EmailParsingPipeline:
         print(f"🔁 Execution ID: {self.execution_id}")
 
         # Step 1: Set up services
-        self.gmail_service = get_gmail_service()
+        # token.json is read (and refreshed if needed) once; worker threads build their services from these credentials
+        self.gmail_credentials = get_gmail_credentials()
+        self.gmail_service = build_gmail_service(self.gmail_credentials)
         print("✅ Gmail Service initialized")
         self.sheet_service = SheetService()
         print("✅ Google Sheets Service initialized")
+        self.message_store = MessageStore()
+        print("✅ Gmail message cache initialized")
+        self.extraction_cache = ExtractionCache() if USE_EXTRACTION_CACHE else None
+        if self.extraction_cache:
+            print("✅ PDF extraction cache initialized")
 
         # Step 2: Load config
         self.email_configs = load_email_configs(EMAIL_CONFIGS_PATH)
@@ -36,14 +51,31 @@ class EmailParsingPipeline:
     def execute(self):
         log_store = []
         # Step 4: Find and filter emails
-        emails = get_matching_emails(self.gmail_service, self.email_configs, self.start_date, self.end_date)
+        sync_key = checkpoint_key(build_query(self.start_date, self.end_date, self.email_configs), self.email_configs)
+        history_id = get_current_history_id(self.gmail_service)
+        since_history_id = get_history_checkpoint(sync_key) if INCREMENTAL_SYNC else None
+        emails = get_matching_emails(
+            self.gmail_service,
+            self.email_configs,
+            self.start_date,
+            self.end_date,
+            since_history_id=since_history_id,
+            message_store=self.message_store
+        )
         log_and_collect(f"📬 Found {len(emails)} matching emails", log_store)
 
         filtered_emails = self.sheet_service.filter_out_already_processed_emails(emails)
         log_and_collect(f"📬 Processing {len(filtered_emails)} emails after filtering", log_store)
 
         # Step 5: Parse emails
-        parsed_emails = parse_emails(filtered_emails, self.gmail_service, execution_id=self.execution_id)
+        parsed_emails = parse_emails(
+            filtered_emails,
+            self.gmail_service,
+            execution_id=self.execution_id,
+            message_store=self.message_store,
+            service_factory=lambda: build_gmail_service(self.gmail_credentials),
+            extraction_cache=self.extraction_cache
+        )
         log_and_collect(f"✅ Parsed {len(parsed_emails)} emails", log_store)
 
         # Step 6: Post-process
@@ -65,6 +97,24 @@ class EmailParsingPipeline:
             log="\n".join(log_store)
         )
 
+        # Step 9: Checkpoint Gmail history for the next incremental run
+        save_history_checkpoint(sync_key, history_id)
+
+def recategorize_history():
+    log_store = []
+    sheet_service = SheetService()
+    rules = sheet_service.load_category_rules()
+    log_and_collect(f"✅ Category rules loaded: {len(rules)}", log_store)
+
+    rows = sheet_service.load_transaction_rows()
+    updates = recategorize_rows(rules, rows)
+    log_and_collect(f"🏷️ {len(updates)} of {len(rows)} transactions change category", log_store)
+
+    sheet_service.update_transaction_categories(updates, log_store)
+
 if __name__ == '__main__':
-    pipeline = EmailParsingPipeline()
-    pipeline.execute()
+    if RECATEGORIZE_HISTORY:
+        recategorize_history()
+    else:
+        pipeline = EmailParsingPipeline()
+        pipeline.execute()
@@ -0,0 +1,56 @@
+from collections import deque
+from typing import Dict, List, Set
+
+
+class AhoCorasick:
+    """
+    Multi-pattern substring matcher. find() returns the ids (list positions) of every
+    pattern that occurs in the text in a single pass, i.e. {i for i, p in enumerate(patterns) if p in text}.
+    Patterns are matched as-is; callers lower-case both sides for case-insensitive matching.
+    """
+
+    def __init__(self, patterns: List[str]):
+        self._goto: List[Dict[str, int]] = [{}]
+        self._fail: List[int] = [0]
+        self._output: List[Set[int]] = [set()]
+        self._always: Set[int] = set()
+
+        for pattern_id, pattern in enumerate(patterns):
+            if not pattern:
+                # The empty string is a substring of everything
+                self._always.add(pattern_id)
+                continue
+            state = 0
+            for char in pattern:
+                next_state = self._goto[state].get(char)
+                if next_state is None:
+                    next_state = len(self._goto)
+                    self._goto[state][char] = next_state
+                    self._goto.append({})
+                    self._fail.append(0)
+                    self._output.append(set())
+                state = next_state
+            self._output[state].add(pattern_id)
+
+        queue = deque(self._goto[0].values())
+        while queue:
+            state = queue.popleft()
+            for char, next_state in self._goto[state].items():
+                queue.append(next_state)
+                fallback = self._fail[state]
+                while fallback and char not in self._goto[fallback]:
+                    fallback = self._fail[fallback]
+                self._fail[next_state] = self._goto[fallback].get(char, 0)
+                self._output[next_state] |= self._output[self._fail[next_state]]
+
+    def find(self, text: str) -> Set[int]:
+        found = set(self._always)
+        goto, fail, output = self._goto, self._fail, self._output
+        state = 0
+        for char in text:
+            while state and char not in goto[state]:
+                state = fail[state]
+            state = goto[state].get(char, 0)
+            if output[state]:
+                found |= output[state]
+        return found
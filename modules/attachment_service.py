@@ -1,63 +1,102 @@
+import io
 import os
 import base64
-import tempfile
 import pikepdf
-from typing import Any
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable, Dict, List, Optional, Union
 from domain.email import Email
+from modules.message_store import MessageStore
 from modules.password_lookup import get_pdf_password
-from constants import PDF_OUTPUT_DIRECTORY
+from constants import PDF_OUTPUT_DIRECTORY, ATTACHMENT_WORKERS, SAVE_UNLOCKED_PDFS
 
-os.makedirs(PDF_OUTPUT_DIRECTORY, exist_ok=True)
+def unlocked_pdf_path(email: Email) -> str:
+    # Named by account and date for people browsing the folder, and by message id so it is unique
+    return os.path.join(PDF_OUTPUT_DIRECTORY, f"{email.get_filename_prefix()}_{email.message_id}.pdf")
 
-def save_unlocked_attachment_pdf(email: Email, service: Any) -> str:
-    message = email.message
+def load_unlocked_attachment_pdf(email: Email, service: Any, message_store: Optional[MessageStore] = None) -> bytes:
     account_id = email.config.id
-    filename = email.get_filename_prefix() + ".pdf"
-    unlocked_path = os.path.join(PDF_OUTPUT_DIRECTORY, filename)
 
-    # Step 1: Check if already saved
-    if os.path.exists(unlocked_path):
-        return unlocked_path
+    # Step 0: A copy unlocked on an earlier run is used as is
+    if SAVE_UNLOCKED_PDFS:
+        try:
+            with open(unlocked_pdf_path(email), "rb") as f:
+                return f.read()
+        except FileNotFoundError:
+            pass
 
-    # Step 2: Find first .pdf part
-    parts = message.get("payload", {}).get("parts", [])
-    pdf_part = next((p for p in parts if p.get("filename", "").lower().endswith(".pdf")), None)
+    # Step 1: Find first .pdf part
+    pdf_part = next((part for part in email.attachments if part[0].lower().endswith(".pdf")), None)
     if not pdf_part:
         raise ValueError(f"No PDF attachment found for email {email.get_message_id()}")
 
-    attachment_id = pdf_part.get("body", {}).get("attachmentId")
+    attachment_id = pdf_part[1]
     if not attachment_id:
         raise ValueError(f"No attachment ID found for email {email.get_message_id()}")
 
-    att = service.users().messages().attachments().get(
-        userId="me",
-        messageId=message["id"],
-        id=attachment_id
-    ).execute()
+    data = message_store.get_attachment(email.message_id, attachment_id) if message_store else None
+    if data is None:
+        att = service.users().messages().attachments().get(
+            userId="me",
+            messageId=email.message_id,
+            id=attachment_id
+        ).execute()
 
-    data = base64.urlsafe_b64decode(att["data"].encode("UTF-8"))
+        data = base64.urlsafe_b64decode(att["data"].encode("UTF-8"))
+        if message_store:
+            message_store.put_attachment(email.message_id, attachment_id, data)
 
-    # Step 3: Save to a temporary file
-    with tempfile.NamedTemporaryFile(delete=False, suffix=".pdf") as temp_pdf:
-        temp_pdf.write(data)
-        temp_pdf_path = temp_pdf.name
-
-    # Step 4: Determine unlock path
+    # Step 2: Unlock in memory, no password means the PDF is assumed to be unlocked already
     password = get_pdf_password(account_id)
 
     try:
-        if password:
-            # Unlock the PDF using password
-            with pikepdf.open(temp_pdf_path, password=password) as pdf:
-                pdf.save(unlocked_path)
-        else:
-            # Assume it's already unlocked
-            with pikepdf.open(temp_pdf_path) as pdf:
-                pdf.save(unlocked_path)
-
-        os.remove(temp_pdf_path)
-        return unlocked_path
-
+        unlocked = io.BytesIO()
+        with pikepdf.open(io.BytesIO(data), password=password or "") as pdf:
+            pdf.save(unlocked)
+        unlocked_bytes = unlocked.getvalue()
     except Exception as e:
-        os.remove(temp_pdf_path)
         raise ValueError(f"Failed to process PDF for {account_id}: {e}")
+
+    # Step 3: Optionally keep a copy on disk for the next run
+    if SAVE_UNLOCKED_PDFS:
+        os.makedirs(PDF_OUTPUT_DIRECTORY, exist_ok=True)
+        path = unlocked_pdf_path(email)
+        temp_path = f"{path}.{threading.get_ident()}.tmp"
+        with open(temp_path, "wb") as f:
+            f.write(unlocked_bytes)
+        os.replace(temp_path, path)
+
+    return unlocked_bytes
+
+def prefetch_unlocked_pdfs(
+    emails: List[Email],
+    service_factory: Callable[[], Any],
+    message_store: Optional[MessageStore] = None,
+    max_workers: int = ATTACHMENT_WORKERS
+) -> Dict[str, Union[bytes, Exception]]:
+    """
+    Downloads and unlocks the PDF attachment of every email on a bounded thread pool, once
+    per message however many fields use it. Gmail service objects are not thread-safe, so
+    every worker builds its own through service_factory.
+    Returns a dict of message id -> unlocked pdf bytes, or the exception raised for it.
+    """
+    local = threading.local()
+
+    def unlock(email: Email) -> bytes:
+        if not hasattr(local, "service"):
+            local.service = service_factory()
+        return load_unlocked_attachment_pdf(email, local.service, message_store)
+
+    unique_emails: Dict[str, Email] = {}
+    for email in emails:
+        unique_emails.setdefault(email.message_id, email)
+
+    results: Dict[str, Union[bytes, Exception]] = {}
+    with ThreadPoolExecutor(max_workers=max_workers) as pool:
+        futures = {message_id: pool.submit(unlock, email) for message_id, email in unique_emails.items()}
+        for message_id, future in futures.items():
+            try:
+                results[message_id] = future.result()
+            except Exception as e:
+                results[message_id] = e
+    return results
@@ -0,0 +1,126 @@
+import re
+from bisect import bisect_left, bisect_right
+from typing import Dict, List, Optional, Pattern
+from constants import CategoryType
+from domain.category_rule import CategoryRule
+from domain.parsed_email import ParsedEmail
+from domain.transaction import Transaction
+from modules.aho_corasick import AhoCorasick
+
+
+class CategoryRuleEngine:
+    """
+    Precompiled equivalent of trying CategoryRule.matches on every rule in order.
+    Every rule is one bit; each condition is turned into the mask of rules it allows:
+    txn_type by bucket, account_id_contains once per account, all note_contains substrings
+    with one automaton scan, and min/max amounts by bisecting sorted bounds. Regexes are
+    compiled once (an invalid one never matches) and only tried on the rules left in the
+    combined mask, lowest bit (first rule) first, so first-match-wins ordering is kept.
+    """
+
+    def __init__(self, rules: List[CategoryRule]):
+        self.rules = list(rules)
+        self._all = (1 << len(self.rules)) - 1
+
+        self._type_any = self._mask_of(lambda rule: not rule.txn_type)
+        self._type_masks: Dict[str, int] = {}
+        for i, rule in enumerate(self.rules):
+            if rule.txn_type:
+                self._type_masks[rule.txn_type] = self._type_masks.get(rule.txn_type, self._type_any) | (1 << i)
+
+        self._account_any = self._mask_of(lambda rule: not rule.account_id_contains)
+        self._account_masks: Dict[str, int] = {}
+
+        self._note_any = self._mask_of(lambda rule: not rule.note_contains)
+        note_ids: Dict[str, int] = {}
+        self._note_masks: List[int] = []
+        for i, rule in enumerate(self.rules):
+            if rule.note_contains:
+                pattern = rule.note_contains.lower()
+                if pattern not in note_ids:
+                    note_ids[pattern] = len(self._note_masks)
+                    self._note_masks.append(0)
+                self._note_masks[note_ids[pattern]] |= 1 << i
+        self._notes = AhoCorasick(list(note_ids))
+
+        self._regexes: List[Optional[Pattern]] = [self._compile(rule.regex_note) for rule in self.rules]
+        self._regex_mask = self._mask_of(lambda rule: bool(rule.regex_note))
+
+        self._min_bounds, self._min_prefix = self._bounds([(rule.min_amount, i) for i, rule in enumerate(self.rules) if rule.min_amount is not None])
+        self._min_any = self._mask_of(lambda rule: rule.min_amount is None)
+        self._max_bounds, self._max_suffix = self._bounds([(rule.max_amount, i) for i, rule in enumerate(self.rules) if rule.max_amount is not None], suffix=True)
+        self._max_any = self._mask_of(lambda rule: rule.max_amount is None)
+
+    def _mask_of(self, predicate) -> int:
+        mask = 0
+        for i, rule in enumerate(self.rules):
+            if predicate(rule):
+                mask |= 1 << i
+        return mask
+
+    @staticmethod
+    def _compile(pattern: Optional[str]) -> Optional[Pattern]:
+        if not pattern:
+            return None
+        try:
+            return re.compile(pattern, re.IGNORECASE)
+        except re.error:
+            return None
+
+    @staticmethod
+    def _bounds(bounds: List[tuple], suffix: bool = False) -> tuple[List[float], List[int]]:
+        """Sorted bound values with the cumulative mask of rules up to (or from, for suffix) each position."""
+        bounds.sort()
+        values = [value for value, _ in bounds]
+        masks = [0] * (len(bounds) + 1)
+        if suffix:
+            for position in range(len(bounds) - 1, -1, -1):
+                masks[position] = masks[position + 1] | (1 << bounds[position][1])
+        else:
+            for position, (_, i) in enumerate(bounds):
+                masks[position + 1] = masks[position] | (1 << i)
+        return values, masks
+
+    def _account_mask(self, account_id: str) -> int:
+        mask = self._account_masks.get(account_id)
+        if mask is None:
+            account = account_id.lower()
+            mask = self._account_any | self._mask_of(
+                lambda rule: bool(rule.account_id_contains) and rule.account_id_contains.lower() in account
+            )
+            self._account_masks[account_id] = mask
+        return mask
+
+    def _candidates(self, transaction: Transaction, parsed_email: ParsedEmail) -> int:
+        mask = self._type_masks.get(transaction.txn_type, self._type_any) & self._account_mask(parsed_email.account_id)
+        if not mask:
+            return 0
+
+        note_mask = self._note_any
+        for pattern_id in self._notes.find(transaction.note.lower()):
+            note_mask |= self._note_masks[pattern_id]
+        mask &= note_mask
+
+        amount = transaction.amount
+        # Rules with min_amount <= amount, and rules with max_amount >= amount
+        mask &= self._min_any | self._min_prefix[bisect_right(self._min_bounds, amount)]
+        mask &= self._max_any | self._max_suffix[bisect_left(self._max_bounds, amount)]
+        return mask
+
+    def match(self, transaction: Transaction, parsed_email: ParsedEmail) -> Optional[CategoryRule]:
+        """Returns the first rule (in list order) that matches, or None."""
+        mask = self._candidates(transaction, parsed_email)
+        while mask:
+            lowest = mask & -mask
+            i = lowest.bit_length() - 1
+            if not (lowest & self._regex_mask):
+                return self.rules[i]
+            regex = self._regexes[i]
+            if regex is not None and regex.search(transaction.note):
+                return self.rules[i]
+            mask ^= lowest
+        return None
+
+    def categorize(self, transaction: Transaction, parsed_email: ParsedEmail) -> CategoryType:
+        rule = self.match(transaction, parsed_email)
+        return rule.category if rule else "MISC"
@@ -0,0 +1,45 @@
+from typing import List, Optional
+from domain.email_config import EmailConfig
+from modules.aho_corasick import AhoCorasick
+
+
+class EmailConfigMatcher:
+    """
+    Precompiled equivalent of trying EmailConfig.matches_email on every config in order.
+    Sender addresses and subject keywords of all configs go into one automaton each; every
+    pattern maps to a bitmask of the configs using it, so a message is matched with two
+    scans of its headers no matter how many configs there are. The lowest set bit of the
+    combined mask is the first matching config, which keeps first-match-wins ordering.
+    """
+
+    def __init__(self, email_configs: List[EmailConfig]):
+        self.email_configs = list(email_configs)
+        self._senders, self._sender_masks = self._compile([config.from_addresses for config in self.email_configs])
+        self._keywords, self._keyword_masks = self._compile([config.subject_keywords for config in self.email_configs])
+
+    @staticmethod
+    def _compile(patterns_per_config: List[List[str]]) -> tuple[AhoCorasick, List[int]]:
+        pattern_ids = {}
+        masks: List[int] = []
+        for index, patterns in enumerate(patterns_per_config):
+            for pattern in patterns:
+                if pattern not in pattern_ids:
+                    pattern_ids[pattern] = len(masks)
+                    masks.append(0)
+                masks[pattern_ids[pattern]] |= 1 << index
+        return AhoCorasick(list(pattern_ids)), masks
+
+    @staticmethod
+    def _mask(automaton: AhoCorasick, masks: List[int], text: str) -> int:
+        mask = 0
+        for pattern_id in automaton.find(text):
+            mask |= masks[pattern_id]
+        return mask
+
+    def match(self, from_header: str, subject: str) -> Optional[EmailConfig]:
+        mask = self._mask(self._senders, self._sender_masks, from_header.lower())
+        if mask:
+            mask &= self._mask(self._keywords, self._keyword_masks, subject.lower())
+        if not mask:
+            return None
+        return self.email_configs[(mask & -mask).bit_length() - 1]
@@ -1,52 +1,96 @@
-from typing import List, Any
+from concurrent.futures import ThreadPoolExecutor
+from typing import List, Any, Callable, Dict, Optional, Union
 from domain.email import Email
 from domain.parsed_email import ParsedEmail
-from modules.attachment_service import save_unlocked_attachment_pdf
+from modules.attachment_service import prefetch_unlocked_pdfs
+from modules.message_store import MessageStore
 from modules.field_parser.extractor import extract_from_pdf
+from modules.field_parser.pdf_document import PDFDocument
+from modules.field_parser.extraction_cache import ExtractionCache
 from modules.field_parser.processor import process_field
-from modules.field_parser.field_parser_utils import post_validate
+from modules.field_parser.compactor import compact_extracted_content
+from modules.field_parser.field_parser_utils import post_validate, populate_transaction_alignment_scores
+from constants import EMAIL_PARSE_WORKERS
 
-def parse_emails(emails: List[Email], gmail_service: Any, execution_id: str) -> List[ParsedEmail]:
-    parsed_emails: List[ParsedEmail] = []
+def parse_email(
+    email: Email,
+    unlocked_pdfs: Dict[str, Union[bytes, Exception]],
+    execution_id: str,
+    extraction_cache: Optional[ExtractionCache] = None
+) -> ParsedEmail:
+    document = None
+    try:
+        field_outputs = {}
+        script_message = ""
+        for field_name, field_config in email.config.field_parsers.items():
+            # Step 1: Get the input text/table
+            if field_config.type == "pdf_attachment":
+                if document is None:
+                    pdf_bytes = unlocked_pdfs[email.message_id]
+                    if isinstance(pdf_bytes, Exception):
+                        raise pdf_bytes
+                    document = PDFDocument(pdf_bytes, extraction_cache)
+                extracted_content = extract_from_pdf(field_config.pdf_extractor, document)
+                if field_config.compaction:
+                    extracted_content, compaction_message = compact_extracted_content(field_config.compaction, extracted_content, document)
+                    script_message += f"\n field: {field_name} message: {compaction_message}"
+                # Streamed transactions are scored while the rest of the response is still generating
+                on_transaction = (lambda txn, document=document: populate_transaction_alignment_scores(document, [txn])) if field_name == "transactions" else None
+                result, message = process_field(field_config.processor, field_name, extracted_content, on_transaction)
+                post_validate(field_name, result, document)
+                field_outputs[field_name] = result
+                script_message += f"\n field: {field_name} message: {message}"
+            else:
+                raise ValueError(f"Unsupported source: {field_config.type}")
 
-    for email in sorted(emails):
-        try:
-            field_outputs = {}
-            script_message = ""
-            for field_name, field_config in email.config.field_parsers.items():
-                # Step 1: Get the input text/table
-                if field_config.type == "pdf_attachment":
-                    pdf_path = save_unlocked_attachment_pdf(email, gmail_service)
-                    extracted_content = extract_from_pdf(field_config.pdf_extractor, pdf_path)
-                    result, message = process_field(field_config.processor, field_name, extracted_content)
-                    post_validate(field_name, result, pdf_path)
-                    field_outputs[field_name] = result
-                    script_message += f"\n field: {field_name} message: {message}"
-                else:
-                    raise ValueError(f"Unsupported source: {field_config.type}")
+        return ParsedEmail(
+            execution_id=execution_id,
+            message_id=email.get_message_id(),
+            email_date=email.get_email_date(),
+            account_id=email.config.id,
+            **field_outputs,
+            status="success",
+            script_message=script_message
+        )
 
-            parsed_emails.append(
-                ParsedEmail(
-                    execution_id=execution_id,
-                    message_id=email.get_message_id(),
-                    email_date=email.get_email_date(),
-                    account_id=email.config.id,
-                    **field_outputs,
-                    status="success",
-                    script_message=script_message
-                )
-            )
+    except Exception as e:
+        return ParsedEmail(
+            execution_id=execution_id,
+            message_id=email.get_message_id(),
+            email_date=email.get_email_date(),
+            account_id=email.config.id,
+            status="failed",
+            script_message=str(e)
+        )
+    finally:
+        if document is not None:
+            document.close()
 
-        except Exception as e:
-            parsed_emails.append(
-                ParsedEmail(
-                    execution_id=execution_id,
-                    message_id=email.get_message_id(),
-                    email_date=email.get_email_date(),
-                    account_id=email.config.id,
-                    status="failed",
-                    script_message=str(e)
-                )
-            )
+def parse_emails(
+    emails: List[Email],
+    gmail_service: Any,
+    execution_id: str,
+    message_store: Optional[MessageStore] = None,
+    service_factory: Optional[Callable[[], Any]] = None,
+    extraction_cache: Optional[ExtractionCache] = None
+) -> List[ParsedEmail]:
+    sorted_emails = sorted(emails)
+
+    # Step 0: Download and unlock every needed PDF up front, concurrently when each worker can get its own service
+    pdf_emails = [
+        email for email in sorted_emails
+        if any(field_config.type == "pdf_attachment" for field_config in email.config.field_parsers.values())
+    ]
+    if service_factory:
+        unlocked_pdfs = prefetch_unlocked_pdfs(pdf_emails, service_factory, message_store)
+    else:
+        unlocked_pdfs = prefetch_unlocked_pdfs(pdf_emails, lambda: gmail_service, message_store, max_workers=1)
+
+    # Emails are parsed concurrently; most of their time is spent waiting on the LLM
+    with ThreadPoolExecutor(max_workers=EMAIL_PARSE_WORKERS) as pool:
+        parsed_emails = list(pool.map(
+            lambda email: parse_email(email, unlocked_pdfs, execution_id, extraction_cache),
+            sorted_emails
+        ))
 
     return parsed_emails
@@ -1,12 +1,40 @@
+import json
+import time
 from datetime import datetime, date
-from typing import Any, List, Optional
+from typing import Any, Dict, List, Optional
+from googleapiclient.errors import HttpError
 from domain.email import Email
 from domain.email_config import EmailConfig
-from constants import DATE_FORMAT
+from modules.email_matcher import EmailConfigMatcher
+from modules.message_store import MessageStore
+from constants import DATE_FORMAT, GMAIL_LIST_PAGE_SIZE, GMAIL_BATCH_SIZE, GMAIL_BATCH_MAX_RETRIES, GMAIL_METADATA_HEADERS
 
-def build_query(start_date: date, end_date: date, email_configs: List[EmailConfig]) -> str:
+RETRYABLE_STATUSES = {429, 500, 503}
+NOT_FOUND_STATUS = 404
+# Gmail also reports rate limits as 403, told apart from permission errors by the error reason
+FORBIDDEN_STATUS = 403
+RATE_LIMIT_REASONS = {"rateLimitExceeded", "userRateLimitExceeded"}
+
+def is_retryable(error: Exception) -> bool:
+    if not isinstance(error, HttpError):
+        return False
+    if error.resp.status in RETRYABLE_STATUSES:
+        return True
+    if error.resp.status != FORBIDDEN_STATUS:
+        return False
+    try:
+        errors = json.loads(error.content.decode("utf-8"))["error"].get("errors", [])
+    except (ValueError, KeyError, TypeError, AttributeError):
+        return False
+    return any(isinstance(detail, dict) and detail.get("reason") in RATE_LIMIT_REASONS for detail in errors)
+
+def get_window_epochs(start_date: date, end_date: date) -> tuple[int, int]:
     after_epoch = int(datetime.strptime(str(start_date), DATE_FORMAT).timestamp())
     before_epoch = int(datetime.strptime(str(end_date), DATE_FORMAT).timestamp())
+    return after_epoch, before_epoch
+
+def build_query(start_date: date, end_date: date, email_configs: List[EmailConfig]) -> str:
+    after_epoch, before_epoch = get_window_epochs(start_date, end_date)
     # Collect all from addresses from enabled configs
     from_filters = set()
     for config in email_configs:
@@ -19,36 +47,172 @@ def build_query(start_date: date, end_date: date, email_configs: List[EmailConfi
 
     return " ".join(query_parts)
 
-def message_matches_filters(full_msg, email_configs: List[EmailConfig]) -> Optional[EmailConfig]:
+def message_matches_filters(full_msg, matcher: EmailConfigMatcher) -> Optional[EmailConfig]:
     headers = full_msg.get('payload', {}).get('headers', [])
-    from_header = next((h['value'] for h in headers if h['name'] == 'From'), '').lower()
-    subject = next((h['value'] for h in headers if h['name'] == 'Subject'), '').lower()
+    from_header = next((h['value'] for h in headers if h['name'] == 'From'), '')
+    subject = next((h['value'] for h in headers if h['name'] == 'Subject'), '')
+    return matcher.match(from_header, subject)
 
-    for config in email_configs:
-        if config.matches_email(from_header, subject):
-            return config
-    return None
-
-def get_matching_emails(gmail_service: Any, email_configs: List[EmailConfig], start_date: date, end_date: date) -> List[Email]:
-    query = build_query(start_date, end_date, email_configs)
-    result = gmail_service.users().messages().list(
-        userId='me',
-        q=query,
-        labelIds=['INBOX'],
-        maxResults=100
-    ).execute()
-
-    messages = result.get('messages', [])
-    matched = []
+def list_message_ids(gmail_service: Any, query: str) -> List[str]:
+    message_ids = []
+    page_token = None
 
-    for message in messages:
-        full_msg = gmail_service.users().messages().get(
+    while True:
+        result = gmail_service.users().messages().list(
             userId='me',
-            id=message['id'],
-            format='full'
+            q=query,
+            labelIds=['INBOX'],
+            maxResults=GMAIL_LIST_PAGE_SIZE,
+            pageToken=page_token
         ).execute()
 
-        matched_config = message_matches_filters(full_msg, email_configs)
+        message_ids.extend(message['id'] for message in result.get('messages', []))
+        page_token = result.get('nextPageToken')
+        if not page_token:
+            return message_ids
+
+def get_current_history_id(gmail_service: Any) -> str:
+    return str(gmail_service.users().getProfile(userId='me').execute()['historyId'])
+
+def list_message_ids_since(gmail_service: Any, start_history_id: str) -> Optional[List[str]]:
+    """
+    Lists INBOX messages added after start_history_id using users.history.list.
+    Returns None when Gmail no longer has history that far back, in which case
+    the caller has to fall back to a full query.
+    """
+    message_ids = []
+    page_token = None
+
+    while True:
+        try:
+            result = gmail_service.users().history().list(
+                userId='me',
+                startHistoryId=start_history_id,
+                historyTypes=['messageAdded'],
+                labelId='INBOX',
+                maxResults=GMAIL_LIST_PAGE_SIZE,
+                pageToken=page_token
+            ).execute()
+        except HttpError as e:
+            if e.resp.status == NOT_FOUND_STATUS:
+                return None
+            raise
+
+        for record in result.get('history', []):
+            message_ids.extend(added['message']['id'] for added in record.get('messagesAdded', []))
+        page_token = result.get('nextPageToken')
+        if not page_token:
+            return list(dict.fromkeys(message_ids))
+
+def is_within_window(message: dict, start_date: date, end_date: date) -> bool:
+    after_epoch, before_epoch = get_window_epochs(start_date, end_date)
+    received_epoch = int(message.get('internalDate', 0)) // 1000
+    return after_epoch <= received_epoch < before_epoch
+
+def fetch_messages(gmail_service: Any, message_ids: List[str], message_store: Optional[MessageStore] = None, **get_kwargs) -> Dict[str, dict]:
+    """
+    Fetches messages through the Gmail batch endpoint, GMAIL_BATCH_SIZE calls per HTTP round-trip.
+    Messages already in message_store are served from disk and never hit the network.
+    Calls that fail with a retryable status (rate limit, including a 403 rateLimitExceeded, or backend error)
+    are retried with backoff.
+    Returns a dict of message id -> message resource; messages deleted in the meantime are left out.
+    """
+    fetched: Dict[str, dict] = {}
+    pending = []
+    for message_id in dict.fromkeys(message_ids):
+        cached = message_store.get_message(message_id, **get_kwargs) if message_store else None
+        if cached is not None:
+            fetched[message_id] = cached
+        else:
+            pending.append(message_id)
+
+    for attempt in range(GMAIL_BATCH_MAX_RETRIES + 1):
+        retry = []
+
+        def on_response(request_id, response, exception):
+            if exception is None:
+                fetched[request_id] = response
+                if message_store:
+                    message_store.put_message(request_id, response, **get_kwargs)
+            elif isinstance(exception, HttpError) and exception.resp.status == NOT_FOUND_STATUS:
+                # Message was deleted after it was listed
+                return
+            elif is_retryable(exception) and attempt < GMAIL_BATCH_MAX_RETRIES:
+                retry.append(request_id)
+            else:
+                raise RuntimeError(f"❌ Failed to fetch email {request_id}: {exception}")
+
+        for i in range(0, len(pending), GMAIL_BATCH_SIZE):
+            batch = gmail_service.new_batch_http_request(callback=on_response)
+            for message_id in pending[i:i + GMAIL_BATCH_SIZE]:
+                batch.add(
+                    gmail_service.users().messages().get(userId='me', id=message_id, **get_kwargs),
+                    request_id=message_id
+                )
+            batch.execute()
+
+        if not retry:
+            break
+        pending = retry
+        time.sleep(2 ** attempt)
+
+    return fetched
+
+def get_matching_emails(
+    gmail_service: Any,
+    email_configs: List[EmailConfig],
+    start_date: date,
+    end_date: date,
+    header_first: bool = True,
+    since_history_id: Optional[str] = None,
+    message_store: Optional[MessageStore] = None
+) -> List[Email]:
+    message_ids = None
+    if since_history_id:
+        message_ids = list_message_ids_since(gmail_service, since_history_id)
+        if message_ids is None:
+            print(f"⚠️ History checkpoint {since_history_id} is too old, falling back to a full query")
+        else:
+            print(f"🔄 Incremental sync: {len(message_ids)} new messages since history {since_history_id}")
+
+    # History listings are not restricted to the date window, the full query is
+    incremental = message_ids is not None
+    if message_ids is None:
+        message_ids = list_message_ids(gmail_service, build_query(start_date, end_date, email_configs))
+
+    matcher = EmailConfigMatcher(email_configs)
+
+    def is_candidate(message: dict) -> bool:
+        return not incremental or is_within_window(message, start_date, end_date)
+
+    if header_first:
+        # Phase 1: match on the From/Subject/Date headers only
+        headers_by_id = fetch_messages(gmail_service, message_ids, message_store, format='metadata', metadataHeaders=GMAIL_METADATA_HEADERS)
+        matched_configs = {}
+        for message_id in message_ids:
+            header_msg = headers_by_id.get(message_id)
+            if not header_msg or not is_candidate(header_msg):
+                continue
+            matched_config = message_matches_filters(header_msg, matcher)
+            if matched_config:
+                matched_configs[message_id] = matched_config
+
+        # Phase 2: download full payloads for matched messages only
+        messages = fetch_messages(gmail_service, list(matched_configs), message_store, format='full')
+        return [
+            Email(config=config, message=messages[message_id])
+            for message_id, config in matched_configs.items()
+            if message_id in messages
+        ]
+
+    messages = fetch_messages(gmail_service, message_ids, message_store, format='full')
+
+    matched = []
+    for message_id in message_ids:
+        full_msg = messages.get(message_id)
+        if not full_msg or not is_candidate(full_msg):
+            continue
+        matched_config = message_matches_filters(full_msg, matcher)
 
         if matched_config:
             matched.append(Email(config=matched_config, message=full_msg))
@@ -0,0 +1,107 @@
+import re
+from typing import List
+from pydantic import BaseModel
+from domain.transaction import Transaction
+from modules.field_parser.field_parser_utils import count_tokens
+
+
+class InputChunk(BaseModel):
+    text: str
+    # Lines repeated from the end of the previous chunk when a page had to be split
+    overlap_text: str = ""
+    page_numbers: List[int]
+
+
+def split_page(text: str, max_tokens: int, overlap_lines: int) -> List[tuple[str, str]]:
+    """
+    Splits an oversized page on line boundaries into (text, overlap_text) pieces of at most
+    max_tokens each; every piece after the first starts with the last overlap_lines lines
+    of the one before, so a row cut at the seam is still seen whole by one request.
+    """
+    lines = text.split("\n")
+    line_tokens = [count_tokens(line) for line in lines]
+
+    pieces = []
+    start = 0
+    overlap_start = 0
+    while start < len(lines):
+        end = start
+        tokens = sum(line_tokens[overlap_start:start])
+        while end < len(lines) and (end == start or tokens + line_tokens[end] <= max_tokens):
+            tokens += line_tokens[end]
+            end += 1
+        pieces.append(("\n".join(lines[overlap_start:end]), "\n".join(lines[overlap_start:start])))
+        overlap_start = max(start, end - overlap_lines)
+        start = end
+    return pieces
+
+
+def pack_inputs(pages: List[str], max_tokens: int, overlap_lines: int) -> List[InputChunk]:
+    """
+    Packs consecutive small pages into one request and splits oversized ones, so every
+    chunk stays within max_tokens and the whole input goes out in as few requests as possible.
+    """
+    pieces = []
+    for page_number, page in enumerate(pages, start=1):
+        if count_tokens(page) <= max_tokens:
+            pieces.append((page, "", page_number))
+        else:
+            pieces.extend((text, overlap_text, page_number) for text, overlap_text in split_page(page, max_tokens, overlap_lines))
+
+    chunks: List[InputChunk] = []
+    chunk_tokens = 0
+    for text, overlap_text, page_number in pieces:
+        tokens = count_tokens(text)
+        # A piece carrying overlap always starts a new request, its seam is deduplicated later
+        if chunks and not overlap_text and chunk_tokens + tokens <= max_tokens:
+            chunks[-1].text += "\n\n" + text
+            if page_number not in chunks[-1].page_numbers:
+                chunks[-1].page_numbers.append(page_number)
+            chunk_tokens += tokens
+        else:
+            chunks.append(InputChunk(text=text, overlap_text=overlap_text, page_numbers=[page_number]))
+            chunk_tokens = tokens
+    return chunks
+
+
+def amount_appears_in(amount: float, text: str) -> bool:
+    # Digits are compared without commas, statements group them differently (1,234,567.00 vs 12,34,567.00)
+    digits = text.replace(",", "")
+    return any(re.search(rf"(?<!\d){re.escape(form)}", digits) for form in {f"{amount:.2f}", f"{amount:g}"})
+
+
+def normalize_text(text: str) -> str:
+    return " ".join(text.lower().split())
+
+
+def drop_seam_duplicates(previous: List[Transaction], current: List[Transaction], overlap_text: str) -> List[Transaction]:
+    """
+    Removes transactions of `current` that were already returned for the overlapping lines
+    at the end of `previous`. A transaction only counts as a repeat of an identical one (date,
+    amount, type and note) from the previous chunk that was read from an overlap line, i.e. a
+    line printing both its amount and its note; each such line accounts for one repeat at most.
+    """
+    if not overlap_text:
+        return current
+
+    overlap_lines = [normalize_text(line) for line in overlap_text.split("\n")]
+    used_lines = set()
+    repeats = []
+    for txn in previous:
+        note = normalize_text(txn.note)
+        line = next((
+            i for i, overlap_line in enumerate(overlap_lines)
+            if i not in used_lines and note in overlap_line and amount_appears_in(txn.amount, overlap_line)
+        ), None)
+        if line is not None:
+            used_lines.add(line)
+            repeats.append((txn.date, txn.amount, txn.txn_type, note))
+
+    kept = []
+    for txn in current:
+        key = (txn.date, txn.amount, txn.txn_type, normalize_text(txn.note))
+        if key in repeats:
+            repeats.remove(key)
+            continue
+        kept.append(txn)
+    return kept
@@ -0,0 +1,187 @@
+import re
+from bisect import bisect_left, bisect_right
+from typing import Any, List, Optional, Tuple
+from domain.field_parser_config import LayoutCompactionConfig
+from modules.field_parser.pdf_document import PDFDocument
+from modules.field_parser.field_parser_utils import count_tokens
+
+# Lines whose words cannot be found on the page fall back to layout text runs of two or more spaces
+CELL_REGEX = re.compile(r"\S+(?: \S+)*")
+COLUMN_DELIMITER = " | "
+# Words further apart than this share of their height start a new cell; a space is about a quarter of it
+CELL_GAP_RATIO = 0.5
+# Words whose tops are this many points apart or less are on the same line
+LINE_TOLERANCE = 3
+# Repeated page headers/footers are only looked for this close to the top or bottom of a page
+HEADER_FOOTER_LINES = 3
+
+# (x0, x1, text) in points
+Cell = Tuple[float, float, str]
+
+
+def word_lines(words: List[dict]) -> List[List[dict]]:
+    """Groups a page's words into lines by their top, each line ordered left to right."""
+    lines: List[List[dict]] = []
+    for word in sorted(words, key=lambda word: (word["top"], word["x0"])):
+        if lines and word["top"] - lines[-1][0]["top"] <= LINE_TOLERANCE:
+            lines[-1].append(word)
+        else:
+            lines.append([word])
+    return [sorted(line, key=lambda word: word["x0"]) for line in lines]
+
+
+def words_to_cells(words: List[dict]) -> List[Cell]:
+    cells: List[Cell] = []
+    for word in words:
+        if cells and word["x0"] - cells[-1][1] <= CELL_GAP_RATIO * (word["bottom"] - word["top"]):
+            start, _, text = cells[-1]
+            cells[-1] = (start, word["x1"], f"{text} {word['text']}")
+        else:
+            cells.append((word["x0"], word["x1"], word["text"]))
+    return cells
+
+
+def page_line_cells(text: str, words: List[dict]) -> List[Optional[List[Cell]]]:
+    """
+    Cells of every line of a page's extracted text, split where its words are far apart on the
+    page. Layout text can put a single space between columns, so runs of spaces are not used.
+    The first and last lines may be cut at the extractor's markers and are matched on the end
+    or start of a page line; a line whose words are not found gets None.
+    """
+    by_words = {}
+    for line in word_lines(words):
+        by_words.setdefault(tuple(word["text"] for word in line), line)
+
+    lines = [tuple(line.split()) for line in text.split("\n")]
+    result: List[Optional[List[Cell]]] = []
+    for i, tokens in enumerate(lines):
+        found = by_words.get(tokens)
+        if found is None and tokens and i in (0, len(lines) - 1):
+            for page_tokens, page_words in by_words.items():
+                if i == 0 and page_tokens[-len(tokens):] == tokens:
+                    found = page_words[-len(tokens):]
+                    break
+                if i == len(lines) - 1 and page_tokens[:len(tokens)] == tokens:
+                    found = page_words[:len(tokens)]
+                    break
+        result.append(words_to_cells(found) if found else None)
+    return result
+
+
+def find_page(document: PDFDocument, text: str, first_page: int) -> Optional[int]:
+    for page_number in range(first_page, document.page_count):
+        if text in document.layout_text(page_number):
+            return page_number
+    return None
+
+
+def column_spans(page_cells: List[List[Optional[List[Cell]]]]) -> List[Tuple[float, float]]:
+    """
+    x ranges of the table columns: the cells of every line with two or more cells (the column
+    header included, so a column no row fills is kept), merged where they overlap.
+    """
+    intervals = sorted(
+        (start, end)
+        for lines in page_cells for cells in lines if cells and len(cells) > 1
+        for start, end, _ in cells
+    )
+    spans: List[Tuple[float, float]] = []
+    for start, end in intervals:
+        if spans and start < spans[-1][1]:
+            spans[-1] = (spans[-1][0], max(spans[-1][1], end))
+        else:
+            spans.append((start, end))
+    return spans
+
+
+def compact_line(cells: List[Cell], column_ends: List[float]) -> str:
+    """
+    Joins the cells with column delimiters, leaving an empty cell for every column the line
+    skips, so a value keeps its column (e.g. withdrawal vs deposit). Trailing empty cells are dropped.
+    """
+    parts: List[str] = []
+    filled = -1
+    for start, end, text in cells:
+        column = bisect_right(column_ends, start)
+        if column > filled:
+            parts.extend([""] * (column - filled - 1))
+        parts.append(text)
+        filled = max(filled, column, bisect_left(column_ends, end))
+    return COLUMN_DELIMITER.join(parts)
+
+
+def compact_layout_text(config: LayoutCompactionConfig, pages: List[str], document: PDFDocument) -> List[str]:
+    """
+    Collapses layout padding into column delimiters (keeping empty columns), drops blank lines
+    and boilerplate, and keeps only the first occurrence of a header/footer line repeated across pages.
+    Columns come from the positions of the words on the document's pages the text was extracted from.
+    """
+    boilerplate_regexes = [re.compile(pattern) for pattern in config.boilerplate_patterns]
+
+    # Extracted pages are in document order, each cut out of one page's layout text
+    page_cells = []
+    next_page = 0
+    for text in pages:
+        page_number = find_page(document, text, next_page)
+        if page_number is None:
+            page_cells.append([None] * len(text.split("\n")))
+            continue
+        page_cells.append(page_line_cells(text, document.words(page_number)))
+        next_page = page_number + 1
+    column_ends = [end for _, end in column_spans(page_cells)]
+
+    # (cell count, text for boilerplate and repeat checks, compacted line)
+    compacted_pages: List[List[tuple]] = []
+    for text, line_cells in zip(pages, page_cells):
+        compacted = []
+        for line, cells in zip(text.split("\n"), line_cells):
+            if cells is None:
+                texts = CELL_REGEX.findall(line)
+                plain = COLUMN_DELIMITER.join(texts)
+                compacted_line = plain
+            else:
+                texts = [cell_text for _, _, cell_text in cells]
+                plain = COLUMN_DELIMITER.join(texts)
+                compacted_line = compact_line(cells, column_ends)
+            if not plain or any(regex.search(plain) for regex in boilerplate_regexes):
+                continue
+            compacted.append((len(texts), plain, compacted_line))
+        compacted_pages.append(compacted)
+
+    if config.drop_repeated_lines and len(compacted_pages) > 1:
+        # Only single-cell lines at the edges of a page count as headers/footers. Rows in the middle,
+        # each page's first line and multi-column lines (the column header) are never dropped.
+        edges = [
+            {plain for _, plain, _ in lines[:HEADER_FOOTER_LINES] + lines[-HEADER_FOOTER_LINES:]}
+            for lines in compacted_pages
+        ]
+        seen = set()
+        for page_number, lines in enumerate(compacted_pages):
+            kept = []
+            for i, (cell_count, plain, compacted) in enumerate(lines):
+                at_edge = 0 < i < HEADER_FOOTER_LINES or i >= len(lines) - HEADER_FOOTER_LINES
+                repeated = at_edge and cell_count == 1 and sum(plain in page_edges for page_edges in edges) > 1
+                if repeated and plain in seen:
+                    continue
+                if repeated:
+                    seen.add(plain)
+                kept.append((cell_count, plain, compacted))
+            compacted_pages[page_number] = kept
+
+    return ["\n".join(compacted for _, _, compacted in lines) for lines in compacted_pages]
+
+
+def compact_extracted_content(config: LayoutCompactionConfig, extracted_content: Any, document: PDFDocument) -> tuple[Any, str]:
+    if isinstance(extracted_content, str):
+        pages = [extracted_content]
+    elif isinstance(extracted_content, list) and all(isinstance(page, str) for page in extracted_content):
+        pages = extracted_content
+    else:
+        return extracted_content, ""
+
+    compacted = compact_layout_text(config, pages, document)
+    before = sum(count_tokens(page) for page in pages)
+    after = sum(count_tokens(page) for page in compacted)
+    message = f"Compacted layout text from {before} to {after} tokens"
+    print(message)
+    return (compacted[0] if isinstance(extracted_content, str) else compacted), message
@@ -0,0 +1,86 @@
+import os
+import json
+import hashlib
+import threading
+import pdfplumber
+from collections import OrderedDict
+from typing import Any
+from constants import EXTRACTION_CACHE_DIRECTORY, EXTRACTION_CACHE_MAX_BYTES
+
+# Bump when the shape of cached artifacts or the extractors' output changes
+EXTRACTION_CACHE_VERSION = 1
+
+# Returned by ExtractionCache.get on a miss, since None is a valid cached result
+MISSING = object()
+
+
+class ExtractionCache:
+    """
+    Disk-backed cache of pdfplumber page artifacts and extractor results.
+    Keys always include the PDF content hash and the pdfplumber version, so a
+    different statement or parser never reads stale entries. Entries hold decrypted
+    statement text; the least recently used are evicted past max_bytes.
+    """
+
+    def __init__(self, directory: str = EXTRACTION_CACHE_DIRECTORY, max_bytes: int = EXTRACTION_CACHE_MAX_BYTES):
+        self.directory = directory
+        self.max_bytes = max_bytes
+        self._lock = threading.Lock()
+        self._entries: "OrderedDict[str, int]" = OrderedDict()
+        self._total_bytes = 0
+
+        os.makedirs(directory, exist_ok=True)
+        existing = []
+        for root, _, files in os.walk(directory):
+            for name in files:
+                if name.endswith(".json"):
+                    stat = os.stat(os.path.join(root, name))
+                    existing.append((stat.st_mtime, os.path.join(root, name), stat.st_size))
+        for _, path, size in sorted(existing):
+            self._entries[path] = size
+            self._total_bytes += size
+
+    def _path(self, *key_parts: str) -> str:
+        key = json.dumps([EXTRACTION_CACHE_VERSION, pdfplumber.__version__, *key_parts])
+        digest = hashlib.sha256(key.encode("utf-8")).hexdigest()
+        return os.path.join(self.directory, digest[:2], digest + ".json")
+
+    def get(self, *key_parts: str) -> Any:
+        path = self._path(*key_parts)
+        with self._lock:
+            if path not in self._entries:
+                return MISSING
+            self._entries.move_to_end(path)
+        try:
+            with open(path, "r", encoding="utf-8") as f:
+                value = json.load(f)["value"]
+            os.utime(path)
+            return value
+        except FileNotFoundError:
+            with self._lock:
+                self._total_bytes -= self._entries.pop(path, 0)
+            return MISSING
+        except (json.JSONDecodeError, KeyError):
+            return MISSING
+
+    def put(self, value: Any, *key_parts: str):
+        data = json.dumps({"value": value}, default=str).encode("utf-8")
+        if len(data) > self.max_bytes:
+            return
+        path = self._path(*key_parts)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        temp_path = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+        with open(temp_path, "wb") as f:
+            f.write(data)
+        os.replace(temp_path, path)
+
+        with self._lock:
+            self._total_bytes += len(data) - self._entries.pop(path, 0)
+            self._entries[path] = len(data)
+            while self._total_bytes > self.max_bytes:
+                evicted_path, evicted_size = self._entries.popitem(last=False)
+                self._total_bytes -= evicted_size
+                try:
+                    os.remove(evicted_path)
+                except FileNotFoundError:
+                    pass
@@ -1,11 +1,14 @@
-import pdfplumber
 import re
 import tiktoken
 import json
-from typing import List, Any, Optional
+from typing import TYPE_CHECKING, List, Any, Optional
 from difflib import SequenceMatcher
 from domain.transaction import Transaction
 
+if TYPE_CHECKING:
+    from modules.field_parser.pdf_document import PDFDocument
+    from modules.field_parser.line_aligner import LineAligner
+
 
 # ✅ Matches:
 #   "₹1,234.56"        → Valid number with currency symbol and decimals
@@ -95,32 +98,24 @@ def fuzzy_match_score(line: str, tx_repr: str) -> float:
     return SequenceMatcher(None, normalize_text(line), normalize_text(tx_repr)).ratio()
 
 
-def populate_transaction_alignment_scores(pdf_path: str, transactions: List[Transaction]) -> None:
-    with pdfplumber.open(pdf_path) as pdf:
-        all_lines = []
-        for page in pdf.pages:
-            text = page.extract_text(layout=True) or ""
-            lines = text.split("\n")
-            all_lines.extend([line.strip() for line in lines if line.strip()])
+def populate_transaction_alignment_scores(document: "PDFDocument", transactions: List[Transaction]) -> None:
+    populate_alignment_scores(document.line_aligner(), transactions)
 
-    if not all_lines:
-        return
 
-    for txn in transactions:
-        tx_repr = f"{txn.date} {txn.note} {txn.amount} {txn.txn_type}"
+def text_to_lines(text: str) -> List[str]:
+    return [line.strip() for line in text.split("\n") if line.strip()]
 
-        best_score = 0.0
-        best_line = ""
 
-        for line in all_lines:
-            score = fuzzy_match_score(line, tx_repr)
-            if score > best_score:
-                best_score = score
-                best_line = line
+def populate_alignment_scores(aligner: "LineAligner", transactions: List[Transaction]) -> None:
+    if not aligner.lines:
+        return
 
+    for txn in transactions:
+        best_score, best_line = aligner.align(txn)
         txn.score = round(best_score, 4)
         txn.best_match_line = best_line
 
-def post_validate(field_name: str, result: Any, pdf_path: str) -> None:
+def post_validate(field_name: str, result: Any, document: "PDFDocument") -> None:
     if field_name == "transactions":
-        populate_transaction_alignment_scores(pdf_path, result)
\ No newline at end of file
+        # Streamed transactions were already scored as they arrived
+        populate_transaction_alignment_scores(document, [txn for txn in result if txn.score is None])
\ No newline at end of file
@@ -0,0 +1,117 @@
+import numpy as np
+from collections import Counter, defaultdict
+from datetime import datetime
+from difflib import SequenceMatcher
+from typing import Dict, List, Optional, Set, Tuple
+from domain.transaction import Transaction
+from modules.field_parser.field_parser_utils import normalize_text
+
+# Renderings of a YYYY-MM-DD date as they look after normalize_text strips the separators
+DATE_KEY_FORMATS = ["%d%m%Y", "%Y%m%d", "%d%m%y", "%m%d%Y"]
+# Indexed lines scored first so the bound below starts pruning from a good match
+SEED_CANDIDATES = 5
+
+
+def transaction_repr(txn: Transaction) -> str:
+    return f"{txn.date} {txn.note} {txn.amount} {txn.txn_type}"
+
+
+def lcs_length(text: str, char_masks: Dict[str, int], length: int) -> int:
+    """
+    Length of the longest common subsequence of text and the string char_masks was built from
+    (bit i of char_masks[c] set when its i-th character is c), bit-parallel in O(len(text)).
+    """
+    full = (1 << length) - 1
+    row = full
+    for char in text:
+        matches = row & char_masks.get(char, 0)
+        row = ((row + matches) | (row - matches)) & full
+    return length - bin(row).count("1")
+
+
+class LineAligner:
+    """
+    Finds, for a transaction, the document line with the highest SequenceMatcher ratio
+    (the first such line on ties), without running SequenceMatcher against every line.
+
+    Lines are normalized once. Per-line character counts give the same upper bound as
+    SequenceMatcher.quick_ratio for all lines in one vectorized step; lines are then scored
+    in decreasing bound order and the scan stops once no remaining line can beat the best.
+    Matching blocks form a common subsequence, so the LCS length is a tighter bound that is
+    checked before each full ratio.
+    An inverted index over amounts, dates and note words picks the lines scored first.
+    """
+
+    def __init__(self, lines: List[str]):
+        self.lines = lines
+        self.normalized = [normalize_text(line) for line in lines]
+        self.alphabet: Dict[str, int] = {char: i for i, char in enumerate(sorted(set("".join(self.normalized))))}
+        self.lengths = np.array([len(text) for text in self.normalized], dtype=np.int64)
+        self.char_counts = np.zeros((len(lines), len(self.alphabet)), dtype=np.int64)
+        self.index: Dict[str, List[int]] = defaultdict(list)
+        for row, text in enumerate(self.normalized):
+            for char, count in Counter(text).items():
+                self.char_counts[row, self.alphabet[char]] = count
+            for token in set(text.split()):
+                self.index[token].append(row)
+
+    def _keys(self, txn: Transaction) -> Set[str]:
+        keys = set(normalize_text(txn.note).split())
+        keys.update(normalize_text(form) for form in (f"{txn.amount:.2f}", f"{txn.amount:g}"))
+        try:
+            date = datetime.strptime(txn.date, "%Y-%m-%d")
+            keys.update(date.strftime(date_format) for date_format in DATE_KEY_FORMATS)
+        except ValueError:
+            pass
+        return keys
+
+    def _seed_rows(self, txn: Transaction) -> List[int]:
+        hits = Counter(row for key in self._keys(txn) for row in self.index.get(key, ()))
+        return [row for row, _ in sorted(hits.items(), key=lambda item: (-item[1], item[0]))[:SEED_CANDIDATES]]
+
+    def align(self, txn: Transaction) -> Tuple[float, str]:
+        """Returns (best ratio, best line), or (0.0, "") when no line shares a character."""
+        tx_text = normalize_text(transaction_repr(txn))
+        tx_counts = np.zeros(len(self.alphabet), dtype=np.int64)
+        for char, count in Counter(tx_text).items():
+            if char in self.alphabet:
+                tx_counts[self.alphabet[char]] = count
+        totals = self.lengths + len(tx_text)
+        # Same arithmetic as SequenceMatcher's ratio so bounds and scores compare exactly
+        bounds = np.where(totals > 0, 2.0 * np.minimum(self.char_counts, tx_counts).sum(axis=1) / np.maximum(totals, 1), 1.0)
+
+        matcher = SequenceMatcher(None)
+        matcher.set_seq2(tx_text)
+        char_masks: Dict[str, int] = defaultdict(int)
+        for i, char in enumerate(tx_text):
+            char_masks[char] |= 1 << i
+        best_score = 0.0
+        best_row: Optional[int] = None
+        scored = set()
+
+        def can_beat(row: int, bound: Optional[float] = None) -> bool:
+            bound = bounds[row] if bound is None else bound
+            return bound > best_score or (bound == best_score and best_row is not None and row < best_row)
+
+        def score(row: int):
+            nonlocal best_score, best_row
+            scored.add(row)
+            if totals[row] and not can_beat(row, 2.0 * lcs_length(self.normalized[row], char_masks, len(tx_text)) / totals[row]):
+                return
+            matcher.set_seq1(self.normalized[row])
+            ratio = matcher.ratio()
+            if ratio > best_score or (ratio == best_score and best_row is not None and row < best_row):
+                best_score, best_row = ratio, row
+
+        for row in self._seed_rows(txn):
+            if can_beat(row):
+                score(row)
+
+        # Highest bound first, lowest line first among equal bounds
+        for row in np.lexsort((np.arange(len(self.lines)), -bounds)).tolist():
+            if not can_beat(row):
+                break
+            if row not in scored:
+                score(row)
+
+        return best_score, self.lines[best_row] if best_row is not None else ""
@@ -0,0 +1,175 @@
+import os
+import queue
+import asyncio
+import threading
+import openai
+from dotenv import load_dotenv
+from typing import Any, Iterator, List, Optional
+from constants import OPEN_AI_API_KEY, OPEN_AI_BASE_URL, LLM_MAX_CONCURRENCY, LLM_TOKENS_PER_MINUTE
+from modules.field_parser.field_parser_utils import count_tokens
+
+load_dotenv()
+
+
+class TokenRateLimiter:
+    """
+    Token bucket refilled continuously at tokens_per_minute. Requests reserve their input
+    tokens up front and are charged their output tokens once the response arrives.
+    """
+
+    def __init__(self, tokens_per_minute: int):
+        self.capacity = tokens_per_minute
+        self.rate = tokens_per_minute / 60
+        self.tokens = float(tokens_per_minute)
+        self.updated: Optional[float] = None
+        self._lock = asyncio.Lock()
+
+    def _refill(self):
+        now = asyncio.get_running_loop().time()
+        if self.updated is not None:
+            self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+
+    async def acquire(self, tokens: int):
+        tokens = min(tokens, self.capacity)
+        async with self._lock:
+            while True:
+                self._refill()
+                if self.tokens >= tokens:
+                    self.tokens -= tokens
+                    return
+                await asyncio.sleep((tokens - self.tokens) / self.rate)
+
+    def charge(self, tokens: int):
+        self._refill()
+        self.tokens -= tokens
+
+
+class LLMRunner:
+    """
+    Runs LLM requests on one background event loop shared by every thread of the process,
+    so the concurrency and tokens-per-minute limits hold across pages and emails alike.
+    The OpenAI base URL can be pointed at a local fake server through OPEN_AI_BASE_URL.
+    """
+
+    def __init__(self, max_concurrency: int = LLM_MAX_CONCURRENCY, tokens_per_minute: int = LLM_TOKENS_PER_MINUTE):
+        self.max_concurrency = max_concurrency
+        self.tokens_per_minute = tokens_per_minute
+        self._loop = asyncio.new_event_loop()
+        self._ready = threading.Event()
+        threading.Thread(target=self._run_loop, name="llm-runner", daemon=True).start()
+        self._ready.wait()
+
+    def _run_loop(self):
+        asyncio.set_event_loop(self._loop)
+        # Loop-bound objects are created on the loop thread
+        self.client = openai.AsyncOpenAI(api_key=os.getenv(OPEN_AI_API_KEY), base_url=os.getenv(OPEN_AI_BASE_URL))
+        self.semaphore = asyncio.Semaphore(self.max_concurrency)
+        self.rate_limiter = TokenRateLimiter(self.tokens_per_minute)
+        self._ready.set()
+        self._loop.run_forever()
+
+    @staticmethod
+    def _request_params(model: str, system_message: str, schema: dict, schema_name: str, input_query: str) -> dict:
+        return dict(
+            model=model,
+            input=[
+                {
+                    "role": "system",
+                    "content": [{"type": "input_text", "text": system_message}]
+                },
+                {
+                    "role": "user",
+                    "content": [{"type": "input_text", "text": input_query}]
+                }
+            ],
+            text={
+                "format": {
+                    "type": "json_schema",
+                    "name": schema_name,
+                    "schema": schema,
+                    "strict": True
+                }
+            },
+            reasoning={},
+            tools=[],
+            temperature=0.01,
+            max_output_tokens=16384,
+            top_p=1,
+            store=True
+        )
+
+    async def _create_response(self, model: str, system_message: str, schema: dict, schema_name: str, input_query: str) -> Any:
+        await self.rate_limiter.acquire(count_tokens(system_message) + count_tokens(input_query))
+        async with self.semaphore:
+            response = await self.client.responses.create(
+                **self._request_params(model, system_message, schema, schema_name, input_query)
+            )
+        if response.usage is not None:
+            self.rate_limiter.charge(response.usage.output_tokens)
+        return response
+
+    async def _stream_response(self, deltas: queue.Queue, index: int, model: str, system_message: str, schema: dict, schema_name: str, input_query: str):
+        await self.rate_limiter.acquire(count_tokens(system_message) + count_tokens(input_query))
+        async with self.semaphore:
+            stream = await self.client.responses.create(
+                **self._request_params(model, system_message, schema, schema_name, input_query),
+                stream=True
+            )
+            async for event in stream:
+                if event.type == "response.output_text.delta":
+                    deltas.put((index, event.delta))
+                elif event.type == "response.completed" and event.response.usage is not None:
+                    self.rate_limiter.charge(event.response.usage.output_tokens)
+                elif event.type in ("response.failed", "response.incomplete", "error"):
+                    raise RuntimeError(f"LLM stream for input {index} ended with {event.type}")
+
+    async def _stream_responses(self, deltas: queue.Queue, model: str, system_message: str, schema: dict, schema_name: str, input_queries: List[str]):
+        try:
+            await asyncio.gather(*[
+                self._stream_response(deltas, index, model, system_message, schema, schema_name, input_query)
+                for index, input_query in enumerate(input_queries)
+            ])
+        finally:
+            deltas.put(None)
+
+    async def _create_responses(self, model: str, system_message: str, schema: dict, schema_name: str, input_queries: List[str]) -> List[Any]:
+        return await asyncio.gather(*[
+            self._create_response(model, system_message, schema, schema_name, input_query)
+            for input_query in input_queries
+        ])
+
+    def create_responses(self, model: str, system_message: str, schema: dict, schema_name: str, input_queries: List[str]) -> List[Any]:
+        """Sends every query concurrently (within the shared limits) and returns the responses in input order."""
+        future = asyncio.run_coroutine_threadsafe(
+            self._create_responses(model, system_message, schema, schema_name, input_queries),
+            self._loop
+        )
+        return future.result()
+
+    def stream_responses(self, model: str, system_message: str, schema: dict, schema_name: str, input_queries: List[str]) -> Iterator[tuple[int, str]]:
+        """
+        Streams every query concurrently (within the shared limits) and yields (input index, text delta)
+        on the calling thread as the deltas arrive, interleaved across inputs.
+        """
+        deltas: queue.Queue = queue.Queue()
+        future = asyncio.run_coroutine_threadsafe(
+            self._stream_responses(deltas, model, system_message, schema, schema_name, input_queries),
+            self._loop
+        )
+        while (item := deltas.get()) is not None:
+            yield item
+        # Surfaces the first failed stream, if any
+        future.result()
+
+
+_runner: Optional[LLMRunner] = None
+_runner_lock = threading.Lock()
+
+
+def get_llm_runner() -> LLMRunner:
+    global _runner
+    with _runner_lock:
+        if _runner is None:
+            _runner = LLMRunner()
+        return _runner
@@ -0,0 +1,223 @@
+import io
+import hashlib
+import threading
+import multiprocessing
+import pdfplumber
+from concurrent.futures import ProcessPoolExecutor
+from typing import Dict, Iterable, Iterator, List, Optional, Tuple
+from constants import PDF_EXTRACTION_WORKERS, PDF_PARALLEL_MIN_PAGES, PDF_STREAM_PAGES_PER_WORKER
+from modules.field_parser.extraction_cache import ExtractionCache, MISSING
+from modules.field_parser.word_index import PageWordIndex
+from modules.field_parser.line_aligner import LineAligner
+
+
+_process_pool: Optional[ProcessPoolExecutor] = None
+_process_pool_lock = threading.Lock()
+# The pool is first needed from an email worker thread while other threads (email workers, the
+# LLM event loop, SQLite and httpx users) are running; forking such a process can deadlock the
+# child, so workers are started from a clean forkserver (or spawned where that is unavailable).
+PROCESS_START_METHOD = "forkserver" if "forkserver" in multiprocessing.get_all_start_methods() else "spawn"
+
+
+def _get_process_pool(workers: int) -> ProcessPoolExecutor:
+    global _process_pool
+    with _process_pool_lock:
+        if _process_pool is None:
+            _process_pool = ProcessPoolExecutor(max_workers=workers, mp_context=multiprocessing.get_context(PROCESS_START_METHOD))
+        return _process_pool
+
+
+def _extract_layout_text_range(pdf_bytes: bytes, page_numbers: List[int]) -> List[str]:
+    # Runs in a worker process, which opens its own copy of the PDF
+    with pdfplumber.open(io.BytesIO(pdf_bytes)) as pdf:
+        return [pdf.pages[page_number].extract_text(layout=True) or "" for page_number in page_numbers]
+
+
+class PDFDocument:
+    """
+    A statement PDF shared by every field parser and post-validation step of one email.
+    The PDF is opened once and each page is parsed at most once per mode: layout text,
+    words and lines are computed lazily and memoized. With an ExtractionCache the page
+    artifacts are also persisted, and pdfplumber is never opened on a full cache hit.
+    """
+
+    def __init__(self, pdf_bytes: bytes, cache: Optional[ExtractionCache] = None):
+        self.pdf_bytes = pdf_bytes
+        self.cache = cache
+        self._pdf = None
+        self._content_hash: Optional[str] = None
+        self._page_count: Optional[int] = None
+        self._layout_text: Dict[int, str] = {}
+        self._words: Dict[int, List[dict]] = {}
+        self._word_indexes: Dict[int, PageWordIndex] = {}
+        self._lines: Optional[List[str]] = None
+        self._line_aligner: Optional[LineAligner] = None
+        self._artifacts_loaded = cache is None
+        self._dirty = False
+
+    @property
+    def content_hash(self) -> str:
+        if self._content_hash is None:
+            self._content_hash = hashlib.sha256(self.pdf_bytes).hexdigest()
+        return self._content_hash
+
+    @property
+    def pdf(self):
+        if self._pdf is None:
+            self._pdf = pdfplumber.open(io.BytesIO(self.pdf_bytes))
+        return self._pdf
+
+    def _load_artifacts(self):
+        if self._artifacts_loaded:
+            return
+        self._artifacts_loaded = True
+        artifacts = self.cache.get("page_artifacts", self.content_hash)
+        if artifacts is MISSING:
+            return
+        self._page_count = artifacts["page_count"]
+        self._layout_text.update({int(page): text for page, text in artifacts["layout_text"].items()})
+        self._words.update({int(page): words for page, words in artifacts["words"].items()})
+
+    @property
+    def page_count(self) -> int:
+        self._load_artifacts()
+        if self._page_count is None:
+            self._page_count = len(self.pdf.pages)
+            self._dirty = True
+        return self._page_count
+
+    def layout_text(self, page_number: int, flush: bool = False) -> str:
+        self._load_artifacts()
+        if page_number not in self._layout_text:
+            page = self.pdf.pages[page_number]
+            self._layout_text[page_number] = page.extract_text(layout=True) or ""
+            if flush:
+                # Drop pdfplumber's per-page char/object caches, only the text is kept
+                page.close()
+            self._dirty = True
+        return self._layout_text[page_number]
+
+    def find_page_with_text(self, text: str, first_page: int = 0) -> Optional[int]:
+        """
+        First page from first_page on whose text contains text (whitespace runs ignored), or None.
+        Pages are checked with pdfplumber's plain text, which is much cheaper than layout text;
+        every page but the match is flushed, so the match's chars are reused by its layout parse.
+        """
+        needle = " ".join(text.split())
+        for page_number in range(first_page, self.page_count):
+            if page_number in self._layout_text:
+                page_text = self._layout_text[page_number]
+            else:
+                page = self.pdf.pages[page_number]
+                page_text = page.extract_text() or ""
+            if needle in " ".join(page_text.split()):
+                return page_number
+            if page_number not in self._layout_text:
+                page.close()
+        return None
+
+    def iter_layout_text(
+        self,
+        first_page: int = 0,
+        workers: int = PDF_EXTRACTION_WORKERS,
+        min_pages: int = PDF_PARALLEL_MIN_PAGES
+    ) -> Iterator[Tuple[int, str]]:
+        """
+        Yields (page_number, layout text) from first_page on, parsing pages only as the
+        consumer asks for them and flushing each page's caches once its text is taken,
+        so a caller that stops early never parses the remaining pages. Long documents are
+        read ahead a small window at a time on the process pool.
+        """
+        page_count = self.page_count
+        missing = sum(1 for page_number in range(first_page, page_count) if page_number not in self._layout_text)
+        parallel = workers > 1 and missing >= min_pages
+        window = workers * PDF_STREAM_PAGES_PER_WORKER
+
+        for page_number in range(first_page, page_count):
+            if parallel and page_number not in self._layout_text:
+                self.prefetch_layout_text(range(page_number, min(page_number + window, page_count)), workers, min_pages=1)
+            yield page_number, self.layout_text(page_number, flush=True)
+
+    def prefetch_layout_text(
+        self,
+        page_numbers: Optional[Iterable[int]] = None,
+        workers: int = PDF_EXTRACTION_WORKERS,
+        min_pages: int = PDF_PARALLEL_MIN_PAGES
+    ):
+        """
+        Computes layout text for the given pages (default: all) that are not memoized yet.
+        Long documents are split into contiguous page ranges parsed on a process pool;
+        below min_pages, or with a single worker, pages are parsed serially.
+        """
+        self._load_artifacts()
+        if page_numbers is None:
+            page_numbers = range(self.page_count)
+        missing = [page_number for page_number in page_numbers if page_number not in self._layout_text]
+        if not missing:
+            return
+
+        if workers <= 1 or len(missing) < min_pages:
+            for page_number in missing:
+                self.layout_text(page_number, flush=True)
+            return
+
+        chunk_size = -(-len(missing) // workers)
+        chunks = [missing[i:i + chunk_size] for i in range(0, len(missing), chunk_size)]
+        pool = _get_process_pool(workers)
+        for chunk, texts in zip(chunks, pool.map(_extract_layout_text_range, [self.pdf_bytes] * len(chunks), chunks)):
+            self._layout_text.update(zip(chunk, texts))
+        self._dirty = True
+
+    def words(self, page_number: int) -> List[dict]:
+        self._load_artifacts()
+        if page_number not in self._words:
+            self._words[page_number] = self.pdf.pages[page_number].extract_words(use_text_flow=True)
+            self._dirty = True
+        return self._words[page_number]
+
+    def word_index(self, page_number: int) -> PageWordIndex:
+        if page_number not in self._word_indexes:
+            self._word_indexes[page_number] = PageWordIndex(self.words(page_number))
+        return self._word_indexes[page_number]
+
+    def lines(self) -> List[str]:
+        """Non-empty, stripped layout lines of the whole document in page order."""
+        if self._lines is None:
+            self.prefetch_layout_text()
+            lines = []
+            for page_number in range(self.page_count):
+                lines.extend(line.strip() for line in self.layout_text(page_number).split("\n") if line.strip())
+            self._lines = lines
+        return self._lines
+
+    def line_aligner(self) -> LineAligner:
+        """Alignment index over lines(), built once and shared by every transaction of the document."""
+        if self._line_aligner is None:
+            self._line_aligner = LineAligner(self.lines())
+        return self._line_aligner
+
+    def save_artifacts(self):
+        if self.cache is None or not self._dirty:
+            return
+        self.cache.put(
+            {
+                "page_count": self.page_count,
+                "layout_text": {str(page): text for page, text in self._layout_text.items()},
+                "words": {str(page): words for page, words in self._words.items()},
+            },
+            "page_artifacts",
+            self.content_hash,
+        )
+        self._dirty = False
+
+    def close(self):
+        self.save_artifacts()
+        if self._pdf is not None:
+            self._pdf.close()
+            self._pdf = None
+
+    def __enter__(self) -> "PDFDocument":
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
@@ -1,21 +1,30 @@
-import os
+import re
 import json
-import openai
-from dotenv import load_dotenv
-from typing import Dict, Type, List, Callable, Any
+import time
+import threading
+from datetime import datetime
+from typing import Dict, Type, List, Callable, Any, Optional
 
-from constants import JSONL_EVAL_PATH, OPEN_AI_API_KEY
+from constants import JSONL_EVAL_PATH
 from domain.transaction import Transaction
 from domain.field_parser_config import NOOPProcessorConfig
 from domain.field_parser_config import TransactionsProcessorUsingLLMConfig
-from modules.field_parser.field_parser_utils import count_tokens, append_eval_jsonl
+from domain.field_parser_config import TieredTransactionsProcessorUsingLLMConfig
+from domain.field_parser_config import TransactionsProcessorUsingLayoutConfig
+from modules.field_parser.field_parser_utils import count_tokens, append_eval_jsonl, extract_amount_from_text
+from modules.field_parser.field_parser_utils import text_to_lines, populate_alignment_scores
+from modules.field_parser.line_aligner import LineAligner
+from modules.field_parser.llm_runner import get_llm_runner
+from modules.field_parser.llm_cache import LLMResponseCache, get_llm_response_cache
+from modules.field_parser.chunker import InputChunk, pack_inputs, drop_seam_duplicates
+from modules.field_parser.stream_parser import ArrayItemStreamParser
 
 def do_nothing(config: NOOPProcessorConfig, field_name: str, extracted_content: Any) -> tuple[Any, str]:
     return extracted_content, "Nothing to be done here"
 
 
-load_dotenv()
-client = openai.OpenAI(api_key=os.getenv(OPEN_AI_API_KEY))
+# Emails are parsed concurrently, keep eval rows whole
+eval_file_lock = threading.Lock()
 
 SYSTEM_MESSAGE = (
     "You extract structured transaction data from bank or credit card statements. "
@@ -75,81 +84,364 @@ TRANSACTION_SCHEMA = {
     "additionalProperties": False
 }
 
-def process_transactions_using_llm(config: TransactionsProcessorUsingLLMConfig, field_name: str, extracted_content: Any) -> tuple[List[Transaction], str]:
+def transaction_from_llm(txn: dict) -> Transaction:
+    return Transaction(
+        date=txn["date"],
+        amount=txn["amount"],
+        note=txn["note"],
+        txn_type=txn["txn_type"],
+        reason=txn["reason"],
+        category="MISC"
+    )
+
+def parse_llm_response(
+    config: TransactionsProcessorUsingLLMConfig,
+    input_query: str,
+    output_text: str,
+    cached: bool = False,
+    transactions: Optional[List[Transaction]] = None
+) -> tuple[List[Transaction], float, str]:
+    try:
+        parsed = json.loads(output_text)
+        if not cached:
+            with eval_file_lock:
+                append_eval_jsonl(SYSTEM_MESSAGE, input_query, output_text, JSONL_EVAL_PATH)
+        # Streamed transactions were already built (and handed out) as they arrived
+        if transactions is None or len(transactions) != len(parsed["transactions"]):
+            transactions = [transaction_from_llm(txn) for txn in parsed["transactions"]]
+        confidence = parsed["confidence"]
+        llm_message = f"Extracting transactions: {len(transactions)} via LLM. Confidence: {confidence}"
+        if cached:
+            llm_message += f"\n 📦 Served {config.model} response from the LLM cache"
+        else:
+            llm_message += f"\n 📤 Running {config.model} responses api for {count_tokens(input_query)} input tokens"
+            llm_message += f"\n 📤 Running {config.model} responses api for {count_tokens(output_text)} output tokens"
+
+        print(llm_message)
+        return transactions, confidence, llm_message
+
+    except (KeyError, ValueError, json.JSONDecodeError) as e:
+        raise ValueError(f"Failed to parse LLM response for input: {input_query}\nError: {e}")
+
+def run_cached_requests(
+    config: TransactionsProcessorUsingLLMConfig,
+    inputs: List[Any],
+    fetch: Callable[[List[str], List[Optional[str]]], None],
+    streamed: Optional[List[List[Transaction]]] = None
+) -> List[tuple[List[Transaction], float, str]]:
+    """
+    Looks every input up in the LLM response cache, lets fetch fill in the output texts that are
+    still None, then parses every response and caches the fetched ones. streamed holds the
+    transactions already built per input while a response was streaming.
+    """
+    input_queries = [str(input_query) for input_query in inputs]
+    cache = get_llm_response_cache()
+    keys = [LLMResponseCache.make_key(config.model, SYSTEM_MESSAGE, TRANSACTION_SCHEMA, input_query) for input_query in input_queries]
+    output_texts = [cache.get(key) for key in keys]
+    cached = [output_text is not None for output_text in output_texts]
+
+    fetch(input_queries, output_texts)
+
+    # Every response that parsed is cached, even when another one of the same field did not;
+    # a malformed answer is retried next run and its error raised once the rest are stored
+    results = []
+    first_error: Optional[ValueError] = None
+    for i, (input_query, output_text, is_cached) in enumerate(zip(input_queries, output_texts, cached)):
+        try:
+            results.append(parse_llm_response(config, input_query, output_text, is_cached, streamed[i] if streamed else None))
+        except ValueError as e:
+            first_error = first_error or e
+            continue
+        if not is_cached:
+            cache.put(keys[i], output_text)
+    if first_error is not None:
+        raise first_error
+    return results
+
+def extract_transactions_per_input(config: TransactionsProcessorUsingLLMConfig, inputs: List[Any]) -> List[tuple[List[Transaction], float, str]]:
+    """
+    Sends every input that is not in the LLM response cache to the LLM concurrently
+    through the shared runner and returns (transactions, confidence, message) per input, in input order.
+    """
+    def fetch(input_queries: List[str], output_texts: List[Optional[str]]):
+        missing = [i for i, output_text in enumerate(output_texts) if output_text is None]
+        for i in missing:
+            print(input_queries[i])
+
+        if missing:
+            responses = get_llm_runner().create_responses(
+                config.model,
+                SYSTEM_MESSAGE,
+                TRANSACTION_SCHEMA,
+                "transaction_response",
+                [input_queries[i] for i in missing]
+            )
+            for i, response in zip(missing, responses):
+                output_texts[i] = response.output_text
+
+    return run_cached_requests(config, inputs, fetch)
+
+def stream_transactions_per_input(
+    config: TransactionsProcessorUsingLLMConfig,
+    inputs: List[Any],
+    on_transaction: Optional[Callable[[Transaction], None]] = None
+) -> List[tuple[List[Transaction], float, str]]:
+    """
+    Same as extract_transactions_per_input, but streams the responses and passes every
+    transaction to on_transaction (on the calling thread) the moment its JSON object closes.
+    """
+    started = time.perf_counter()
+    first_transaction_after = None
+    streamed: List[List[Transaction]] = [[] for _ in inputs]
+
+    def emit(index: int, items: List[dict]):
+        nonlocal first_transaction_after
+        for item in items:
+            transaction = transaction_from_llm(item)
+            streamed[index].append(transaction)
+            if first_transaction_after is None:
+                first_transaction_after = time.perf_counter() - started
+            if on_transaction is not None:
+                on_transaction(transaction)
+
+    def fetch(input_queries: List[str], output_texts: List[Optional[str]]):
+        for i, output_text in enumerate(output_texts):
+            if output_text is not None:
+                emit(i, json.loads(output_text)["transactions"])
+
+        missing = [i for i, output_text in enumerate(output_texts) if output_text is None]
+        if missing:
+            parsers = {i: ArrayItemStreamParser("transactions") for i in missing}
+            deltas: Dict[int, List[str]] = {i: [] for i in missing}
+            for position, delta in get_llm_runner().stream_responses(
+                config.model,
+                SYSTEM_MESSAGE,
+                TRANSACTION_SCHEMA,
+                "transaction_response",
+                [input_queries[i] for i in missing]
+            ):
+                i = missing[position]
+                deltas[i].append(delta)
+                emit(i, parsers[i].feed(delta))
+            for i in missing:
+                output_texts[i] = "".join(deltas[i])
+
+    results = run_cached_requests(config, inputs, fetch, streamed)
+    if first_transaction_after is not None:
+        transactions, confidence, llm_message = results[0]
+        results[0] = (transactions, confidence, f"Streamed the first transaction after {first_transaction_after:.2f}s\n " + llm_message)
+    return results
+
+def process_transactions_using_llm(
+    config: TransactionsProcessorUsingLLMConfig,
+    field_name: str,
+    extracted_content: Any,
+    on_transaction: Optional[Callable[[Transaction], None]] = None
+) -> tuple[List[Transaction], str]:
     if field_name != "transactions":
         raise ValueError(f"{config.__class__.__name__} only supports 'transactions' field")
 
     inputs = extracted_content if isinstance(extracted_content, list) else [extracted_content]
+    chunks = pack_inputs([str(input_query) for input_query in inputs], config.max_input_tokens, config.split_overlap_lines)
+
+    if config.stream:
+        results = stream_transactions_per_input(config, [chunk.text for chunk in chunks], on_transaction)
+    else:
+        results = extract_transactions_per_input(config, [chunk.text for chunk in chunks])
+    all_transactions, all_messages = merge_chunk_results(chunks, [(transactions, llm_message) for transactions, _, llm_message in results])
+    all_messages.insert(0, f"Packed {len(inputs)} pages into {len(chunks)} requests of at most {config.max_input_tokens} input tokens")
+
+    return all_transactions, "\n\n".join(all_messages)
 
+def merge_chunk_results(chunks: List[InputChunk], results: List[tuple[List[Transaction], str]]) -> tuple[List[Transaction], List[str]]:
     all_transactions = []
     all_messages = []
+    previous: List[Transaction] = []
+    for chunk, (transactions, llm_message) in zip(chunks, results):
+        kept = drop_seam_duplicates(previous, transactions, chunk.overlap_text)
+        if len(kept) != len(transactions):
+            llm_message += f"\n Dropped {len(transactions) - len(kept)} transactions repeated across the page split"
+        all_transactions.extend(kept)
+        all_messages.append(llm_message)
+        previous = transactions
+    return all_transactions, all_messages
 
-    for input_query in inputs:
-        input_query = str(input_query)
-        print(input_query)
 
-        response = client.responses.create(
-            model=config.model,
-            input=[
-                {
-                    "role": "system",
-                    "content": [{"type": "input_text", "text": SYSTEM_MESSAGE}]
-                },
-                {
-                    "role": "user",
-                    "content": [{"type": "input_text", "text": input_query}]
-                }
-            ],
-            text={
-                "format": {
-                    "type": "json_schema",
-                    "name": "transaction_response",
-                    "schema": TRANSACTION_SCHEMA,
-                    "strict": True
-                }
-            },
-            reasoning={},
-            tools=[],
-            temperature=0.01,
-            max_output_tokens=16384,
-            top_p=1,
-            store=True
-        )
+def chunk_alignment_score(chunk: InputChunk, transactions: List[Transaction]) -> float:
+    """Average alignment score of the transactions against the lines of the input they came from."""
+    if not transactions:
+        return 1.0
+    # Scored on copies, the final scores against the whole document are set in post_validate
+    scored = [txn.model_copy() for txn in transactions]
+    populate_alignment_scores(LineAligner(text_to_lines(chunk.text)), scored)
+    return sum(txn.score for txn in scored) / len(scored)
+
+def describe_pages(chunk: InputChunk) -> str:
+    first, last = chunk.page_numbers[0], chunk.page_numbers[-1]
+    return f"page {first}" if first == last else f"pages {first}-{last}"
+
+def process_transactions_using_tiered_llm(config: TieredTransactionsProcessorUsingLLMConfig, field_name: str, extracted_content: Any) -> tuple[List[Transaction], str]:
+    if field_name != "transactions":
+        raise ValueError(f"{config.__class__.__name__} only supports 'transactions' field")
+
+    small = TransactionsProcessorUsingLLMConfig(
+        type="llm",
+        model=config.small_model,
+        max_input_tokens=config.max_input_tokens,
+        split_overlap_lines=config.split_overlap_lines
+    )
+    large = small.model_copy(update={"model": config.large_model})
 
+    inputs = extracted_content if isinstance(extracted_content, list) else [extracted_content]
+    chunks = pack_inputs([str(input_query) for input_query in inputs], config.max_input_tokens, config.split_overlap_lines)
+    texts = [chunk.text for chunk in chunks]
+
+    results = extract_transactions_per_input(small, texts)
+    tiers = []
+    escalated = []
+    for i, (chunk, (transactions, confidence, _)) in enumerate(zip(chunks, results)):
+        alignment = chunk_alignment_score(chunk, transactions)
+        tier = f"{describe_pages(chunk)}: {config.small_model} (confidence {confidence}, alignment {alignment:.2f})"
+        if confidence < config.min_confidence or alignment < config.min_alignment_score:
+            escalated.append(i)
+            tier += f" -> escalated to {config.large_model}"
+        tiers.append(tier)
+
+    # Only the requests that failed a threshold are re-run, together, on the large model
+    for i, result in zip(escalated, extract_transactions_per_input(large, [texts[i] for i in escalated])):
+        results[i] = result
+
+    all_transactions, all_messages = merge_chunk_results(chunks, [(transactions, llm_message) for transactions, _, llm_message in results])
+    summary = (
+        f"Packed {len(inputs)} pages into {len(chunks)} requests, "
+        f"{len(chunks) - len(escalated)} served by {config.small_model}, {len(escalated)} escalated to {config.large_model}\n "
+        + "\n ".join(tiers)
+    )
+    print(summary)
+
+    return all_transactions, "\n\n".join([summary] + all_messages)
+
+
+def layout_row_to_transaction(config: TransactionsProcessorUsingLayoutConfig, match: re.Match) -> Optional[Transaction]:
+    groups = match.groupdict()
+
+    date = None
+    for date_format in config.date_formats:
         try:
-            parsed = json.loads(response.output_text)
-            append_eval_jsonl(SYSTEM_MESSAGE, input_query, response.output_text, JSONL_EVAL_PATH)
-            transactions = [
-                Transaction(
-                    date=txn["date"],
-                    amount=txn["amount"],
-                    note=txn["note"],
-                    txn_type=txn["txn_type"],
-                    reason=txn["reason"],
-                    category="MISC"
-                )
-                for txn in parsed["transactions"]
-            ]
-            confidence = parsed["confidence"]
-            llm_message = f"Extracting transactions: {len(transactions)} via LLM. Confidence: {confidence}"
-            llm_message += f"\n 📤 Running {config.model} responses api for {count_tokens(input_query)} input tokens"
-            llm_message += f"\n 📤 Running {config.model} responses api for {count_tokens(response.output_text)} output tokens"
+            date = datetime.strptime((groups.get("date") or "").strip(), date_format).strftime("%Y-%m-%d")
+            break
+        except ValueError:
+            continue
 
-            print(llm_message)
-            all_transactions.extend(transactions)
-            all_messages.append(llm_message)
+    if groups.get("amount"):
+        amount = extract_amount_from_text(groups["amount"])
+        marker = (groups.get("txn_type") or "").strip().upper()
+        txn_type = "CREDIT" if marker in {m.upper() for m in config.credit_markers} else "DEBIT"
+    elif groups.get("credit") and extract_amount_from_text(groups["credit"]):
+        amount = extract_amount_from_text(groups["credit"])
+        txn_type = "CREDIT"
+    else:
+        amount = extract_amount_from_text(groups.get("debit") or "")
+        txn_type = "DEBIT"
 
-        except (KeyError, ValueError, json.JSONDecodeError) as e:
-            raise ValueError(f"Failed to parse LLM response for input: {input_query}\nError: {e}")
+    if date is None or amount is None or amount <= 0:
+        return None
+
+    return Transaction(
+        date=date,
+        amount=amount,
+        note=" ".join((groups.get("note") or "").split()),
+        txn_type=txn_type,
+        reason="Parsed from the statement layout template",
+        category="MISC"
+    )
+
+def parse_layout_page(config: TransactionsProcessorUsingLayoutConfig, page_text: str) -> Optional[List[Transaction]]:
+    """
+    Parses one page of layout text into transactions, or returns None when the page
+    has no rows or has a row the template cannot parse.
+    """
+    row_regex = re.compile(config.row_pattern)
+    row_start_regex = re.compile(config.row_start_pattern) if config.row_start_pattern else None
+
+    transactions = []
+    for line in page_text.split("\n"):
+        line = line.strip()
+        if not line:
+            continue
+
+        match = row_regex.match(line)
+        if not match:
+            if row_start_regex and row_start_regex.match(line):
+                return None
+            continue
+
+        transaction = layout_row_to_transaction(config, match)
+        if transaction is None:
+            return None
+        transactions.append(transaction)
+
+    return transactions or None
+
+def process_transactions_using_layout(config: TransactionsProcessorUsingLayoutConfig, field_name: str, extracted_content: Any) -> tuple[List[Transaction], str]:
+    if field_name != "transactions":
+        raise ValueError(f"{config.__class__.__name__} only supports 'transactions' field")
+
+    inputs = extracted_content if isinstance(extracted_content, list) else [extracted_content]
+
+    pages = [parse_layout_page(config, str(input_query)) for input_query in inputs]
+    fallback_pages = [page_number for page_number, transactions in enumerate(pages) if transactions is None]
+    if fallback_pages and config.fallback is None:
+        raise ValueError(f"Layout template could not parse page {fallback_pages[0] + 1}:\n{inputs[fallback_pages[0]]}")
+
+    # Runs of consecutive unparseable pages are packed like any LLM input and sent to the LLM together,
+    # a run's transactions take the place of its first page so they stay in page order
+    runs: List[List[int]] = []
+    for page_number in fallback_pages:
+        if runs and runs[-1][-1] == page_number - 1:
+            runs[-1].append(page_number)
+        else:
+            runs.append([page_number])
+    run_chunks = [
+        pack_inputs([str(inputs[page_number]) for page_number in run], config.fallback.max_input_tokens, config.fallback.split_overlap_lines)
+        for run in runs
+    ]
+    fallback_results = extract_transactions_per_input(config.fallback, [chunk.text for chunks in run_chunks for chunk in chunks]) if runs else []
+
+    fallback_messages = []
+    position = 0
+    for run, chunks in zip(runs, run_chunks):
+        results = fallback_results[position:position + len(chunks)]
+        position += len(chunks)
+        transactions, llm_messages = merge_chunk_results(chunks, [(transactions, llm_message) for transactions, _, llm_message in results])
+        for page_number in run:
+            pages[page_number] = []
+        pages[run[0]] = transactions
+        described = f"page {run[0] + 1}" if len(run) == 1 else f"pages {run[0] + 1}-{run[-1] + 1}"
+        fallback_messages.append(f"{described}: " + "\n\n".join(llm_messages))
+
+    all_transactions = [transaction for transactions in pages for transaction in transactions]
+
+    message = (
+        f"Extracting transactions: {len(all_transactions)} via layout template. "
+        f"Pages parsed locally: {len(inputs) - len(fallback_pages)}, via LLM fallback: {len(fallback_pages)}"
+    )
+    if fallback_messages:
+        message += "\n\n" + "\n\n".join(fallback_messages)
+    print(message)
+    return all_transactions, message
 
-    return all_transactions, "\n\n".join(all_messages)
 
-    
 PROCESSOR_DISPATCH: Dict[Type, Callable] = {
     NOOPProcessorConfig: do_nothing,
     TransactionsProcessorUsingLLMConfig: process_transactions_using_llm,
+    TieredTransactionsProcessorUsingLLMConfig: process_transactions_using_tiered_llm,
+    TransactionsProcessorUsingLayoutConfig: process_transactions_using_layout,
 }
 
-def process_field(config, field_name: str, extracted_content):
+def process_field(config, field_name: str, extracted_content, on_transaction: Optional[Callable[[Transaction], None]] = None):
     processor = PROCESSOR_DISPATCH[type(config)]
+    # Only streaming processors accept a per-transaction callback
+    if on_transaction is not None and getattr(config, "stream", False):
+        return processor(config, field_name, extracted_content, on_transaction=on_transaction)
     return processor(config, field_name, extracted_content)
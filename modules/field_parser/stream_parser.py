@@ -0,0 +1,61 @@
+import json
+from typing import List, Optional
+
+
+class ArrayItemStreamParser:
+    """
+    Incrementally scans streamed JSON text and returns each object of the top-level
+    `array_key` array as soon as its closing brace arrives. Only the object being read
+    is buffered; the rest of the text is scanned and forgotten.
+    """
+
+    def __init__(self, array_key: str = "transactions"):
+        self.array_key = array_key
+        self.depth = 0
+        self.in_string = False
+        self.escaped = False
+        # Depth of the items of the array once it has been opened
+        self.item_depth: Optional[int] = None
+        self.last_key: Optional[str] = None
+        self._key_chars: Optional[List[str]] = None
+        self._item_chars: Optional[List[str]] = None
+
+    def feed(self, delta: str) -> List[dict]:
+        items = []
+        for char in delta:
+            if self._item_chars is not None:
+                self._item_chars.append(char)
+
+            if self.in_string:
+                if self.escaped:
+                    self.escaped = False
+                elif char == "\\":
+                    self.escaped = True
+                elif char == '"':
+                    self.in_string = False
+                    if self._key_chars is not None:
+                        self.last_key = "".join(self._key_chars)
+                        self._key_chars = None
+                elif self._key_chars is not None:
+                    self._key_chars.append(char)
+                continue
+
+            if char == '"':
+                self.in_string = True
+                # Strings directly inside the top-level object are its keys (or string values)
+                if self.depth == 1:
+                    self._key_chars = []
+            elif char in "{[":
+                if char == "[" and self.depth == 1 and self.last_key == self.array_key and self.item_depth is None:
+                    self.item_depth = self.depth + 1
+                elif char == "{" and self.depth == self.item_depth:
+                    self._item_chars = [char]
+                self.depth += 1
+            elif char in "}]":
+                self.depth -= 1
+                if char == "}" and self._item_chars is not None and self.depth == self.item_depth:
+                    items.append(json.loads("".join(self._item_chars)))
+                    self._item_chars = None
+                elif char == "]" and self.item_depth is not None and self.depth == self.item_depth - 1:
+                    self.item_depth = -1
+        return items
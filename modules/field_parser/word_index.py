@@ -0,0 +1,72 @@
+import numpy as np
+from typing import Dict, List, Optional, Tuple
+from modules.field_parser.field_parser_utils import is_float
+
+# Search bands used by extract_float_near_keyword_from_pdf
+SAME_LINE_TOLERANCE = 5
+SAME_COLUMN_TOLERANCE = 30
+# Band lookups are widened by this much and then filtered with the exact comparison
+BAND_EPSILON = 1e-6
+
+
+class PageWordIndex:
+    """
+    Index over the words of one page. Numeric words are flagged once and their centers
+    kept in NumPy arrays, sorted by y and by x, so a directional lookup is a binary search
+    for the row/column band followed by a vectorized filter over the words inside it.
+    """
+
+    def __init__(self, words: List[dict]):
+        self.words = words
+        self.positions: Dict[str, List[int]] = {}
+        for position, word in enumerate(words):
+            self.positions.setdefault(word['text'].lower(), []).append(position)
+
+        numeric = [position for position, word in enumerate(words) if is_float(word['text'])]
+        self.numeric_positions = np.array(numeric, dtype=np.int64)
+        self.x_centers = np.array([(float(words[p]['x0']) + float(words[p]['x1'])) / 2 for p in numeric], dtype=np.float64)
+        self.y_centers = np.array([(float(words[p]['top']) + float(words[p]['bottom'])) / 2 for p in numeric], dtype=np.float64)
+        self._by_x = np.argsort(self.x_centers, kind="stable")
+        self._by_y = np.argsort(self.y_centers, kind="stable")
+        self._sorted_x = self.x_centers[self._by_x]
+        self._sorted_y = self.y_centers[self._by_y]
+
+    def find_phrase(self, parts: List[str]) -> List[int]:
+        """Start positions of every occurrence of the lower-cased word sequence, in page order."""
+        if not parts:
+            return []
+        return [
+            start for start in self.positions.get(parts[0], [])
+            if start + len(parts) <= len(self.words)
+            and all(self.words[start + j]['text'].lower() == parts[j] for j in range(1, len(parts)))
+        ]
+
+    @staticmethod
+    def _band(order: np.ndarray, sorted_values: np.ndarray, center: float, tolerance: float) -> np.ndarray:
+        low = np.searchsorted(sorted_values, center - tolerance - BAND_EPSILON, side="left")
+        high = np.searchsorted(sorted_values, center + tolerance + BAND_EPSILON, side="right")
+        # Back to page order so that ties on distance resolve to the earliest word
+        return np.sort(order[low:high])
+
+    def nearest_numeric(self, location: str, x0: float, x1: float, top: float, bottom: float) -> Optional[Tuple[float, str]]:
+        """Closest numeric word in the given direction of the box, as (distance, text)."""
+        x_center = (x0 + x1) / 2
+        y_center = (top + bottom) / 2
+
+        if location in ("RIGHT", "LEFT"):
+            candidates = self._band(self._by_y, self._sorted_y, y_center, SAME_LINE_TOLERANCE)
+            xs, ys = self.x_centers[candidates], self.y_centers[candidates]
+            mask = np.abs(ys - y_center) <= SAME_LINE_TOLERANCE
+            mask &= (xs > x1) if location == "RIGHT" else (xs < x0)
+        else:
+            candidates = self._band(self._by_x, self._sorted_x, x_center, SAME_COLUMN_TOLERANCE)
+            xs, ys = self.x_centers[candidates], self.y_centers[candidates]
+            mask = np.abs(xs - x_center) <= SAME_COLUMN_TOLERANCE
+            mask &= (ys > bottom) if location == "BELOW" else (ys < top)
+
+        if not mask.any():
+            return None
+        distances = np.sqrt((xs[mask] - x_center) ** 2 + (ys[mask] - y_center) ** 2)
+        closest = int(np.argmin(distances))
+        position = int(self.numeric_positions[candidates[mask][closest]])
+        return float(distances[closest]), self.words[position]['text']
@@ -6,7 +6,7 @@ from google.auth.transport.requests import Request
 from constants import GMAIL_CREDENTIALS_PATH, GMAIL_SCOPES, GMAIL_TOKEN_PATH
 
 
-def get_gmail_service():
+def get_gmail_credentials() -> Credentials:
     creds = None
 
     # Load token if it exists
@@ -23,4 +23,13 @@ def get_gmail_service():
         with open(GMAIL_TOKEN_PATH, 'w') as token_file:
             token_file.write(creds.to_json())
 
+    return creds
+
+
+def build_gmail_service(creds: Credentials):
+    # Service objects are not thread-safe; worker threads each build one from the same loaded credentials
     return build('gmail', 'v1', credentials=creds)
+
+
+def get_gmail_service():
+    return build_gmail_service(get_gmail_credentials())
@@ -0,0 +1,90 @@
+import os
+import json
+import hashlib
+import threading
+from collections import OrderedDict
+from typing import Optional
+from constants import GMAIL_CACHE_DIRECTORY, GMAIL_CACHE_MAX_BYTES
+
+
+class MessageStore:
+    """
+    On-disk cache of Gmail message resources and attachment bodies.
+    Both are immutable on Gmail's side, so entries never go stale; the store only
+    evicts the least recently used entries once it grows past max_bytes.
+    """
+
+    def __init__(self, directory: str = GMAIL_CACHE_DIRECTORY, max_bytes: int = GMAIL_CACHE_MAX_BYTES):
+        self.directory = directory
+        self.max_bytes = max_bytes
+        self._lock = threading.Lock()
+        self._entries: "OrderedDict[str, int]" = OrderedDict()
+        self._total_bytes = 0
+
+        os.makedirs(directory, exist_ok=True)
+        existing = []
+        for root, _, files in os.walk(directory):
+            for name in files:
+                stat = os.stat(os.path.join(root, name))
+                existing.append((stat.st_mtime, os.path.join(root, name), stat.st_size))
+        for _, path, size in sorted(existing):
+            self._entries[path] = size
+            self._total_bytes += size
+
+    def _path(self, key: str) -> str:
+        digest = hashlib.sha256(key.encode("utf-8")).hexdigest()
+        return os.path.join(self.directory, digest[:2], digest)
+
+    def _read(self, key: str) -> Optional[bytes]:
+        path = self._path(key)
+        with self._lock:
+            if path not in self._entries:
+                return None
+            self._entries.move_to_end(path)
+        try:
+            with open(path, "rb") as f:
+                data = f.read()
+            os.utime(path)
+            return data
+        except FileNotFoundError:
+            with self._lock:
+                self._total_bytes -= self._entries.pop(path, 0)
+            return None
+
+    def _write(self, key: str, data: bytes):
+        if len(data) > self.max_bytes:
+            return
+        path = self._path(key)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        temp_path = f"{path}.{threading.get_ident()}.tmp"
+        with open(temp_path, "wb") as f:
+            f.write(data)
+        os.replace(temp_path, path)
+
+        with self._lock:
+            self._total_bytes += len(data) - self._entries.pop(path, 0)
+            self._entries[path] = len(data)
+            while self._total_bytes > self.max_bytes:
+                evicted_path, evicted_size = self._entries.popitem(last=False)
+                self._total_bytes -= evicted_size
+                try:
+                    os.remove(evicted_path)
+                except FileNotFoundError:
+                    pass
+
+    @staticmethod
+    def _message_key(message_id: str, get_kwargs: dict) -> str:
+        return f"message:{message_id}:{json.dumps(get_kwargs, sort_keys=True)}"
+
+    def get_message(self, message_id: str, **get_kwargs) -> Optional[dict]:
+        data = self._read(self._message_key(message_id, get_kwargs))
+        return json.loads(data) if data is not None else None
+
+    def put_message(self, message_id: str, message: dict, **get_kwargs):
+        self._write(self._message_key(message_id, get_kwargs), json.dumps(message).encode("utf-8"))
+
+    def get_attachment(self, message_id: str, attachment_id: str) -> Optional[bytes]:
+        return self._read(f"attachment:{message_id}:{attachment_id}")
+
+    def put_attachment(self, message_id: str, attachment_id: str, data: bytes):
+        self._write(f"attachment:{message_id}:{attachment_id}", data)
@@ -1,6 +1,8 @@
 import json
+from functools import lru_cache
 from constants import PDF_PASSWORDS_PATH
 
+@lru_cache(maxsize=None)
 def load_passwords():
     with open(PDF_PASSWORDS_PATH, 'r') as f:
         return json.load(f)
@@ -3,16 +3,16 @@ from domain.parsed_email import ParsedEmail
 from domain.transaction import Transaction
 from constants import CategoryType
 from typing import List
+from modules.category_engine import CategoryRuleEngine
 
 class PostProcessor:
     def __init__(self, rules: List[CategoryRule]):
         self.rules = rules
+        # Rules are compiled once; matching gives the same first-match-by-priority result as rule.matches
+        self.engine = CategoryRuleEngine(rules)
 
     def _assign_category(self, txn: Transaction, email: ParsedEmail) -> CategoryType:
-        for rule in self.rules:
-            if rule.matches(txn, email):
-                return rule.category
-        return "MISC"
+        return self.engine.categorize(txn, email)
     
     def process_all(self, emails: List[ParsedEmail]) -> List[ParsedEmail]:
         return [self._process_single(email) for email in emails]
@@ -0,0 +1,86 @@
+import re
+import numpy as np
+from typing import Any, List, Tuple
+from domain.category_rule import CategoryRule
+from modules.field_parser.field_parser_utils import extract_amount_from_text
+
+# Column positions in the transactions sheet, as written by SheetService.write_transactions:
+# execution_id, message_id, account_id, date, txn_type, category, amount, note, ...
+ACCOUNT_ID_COLUMN = 2
+TXN_TYPE_COLUMN = 4
+CATEGORY_COLUMN = 5
+AMOUNT_COLUMN = 6
+NOTE_COLUMN = 7
+
+
+def _value(row: List[Any], index: int) -> Any:
+    return row[index] if len(row) > index else ""
+
+
+def _column(rows: List[List[Any]], index: int) -> np.ndarray:
+    return np.array([str(_value(row, index)) for row in rows], dtype=object)
+
+
+def _amount(value: Any) -> float:
+    # Rows are read unformatted, so amounts arrive as numbers; anything else is parsed, NaN when unreadable
+    if isinstance(value, (int, float)):
+        return float(value)
+    amount = extract_amount_from_text(str(value))
+    return np.nan if amount is None else amount
+
+
+def recategorize_rows(rules: List[CategoryRule], rows: List[List[Any]]) -> List[Tuple[int, str]]:
+    """
+    Re-applies the rules to transaction sheet rows (header excluded) and returns
+    (row position, new category) for every row whose category changes.
+
+    Each rule is a mask over the rows that no earlier rule has claimed, so the first
+    matching rule wins as in CategoryRule.matches; rows no rule claims become MISC.
+    txn_type, account and amount conditions are evaluated on whole columns, the note
+    substring and regex only on the rows that are still candidates after them.
+    """
+    if not rows:
+        return []
+
+    accounts = np.array([account.lower() for account in _column(rows, ACCOUNT_ID_COLUMN)], dtype=object)
+    txn_types = _column(rows, TXN_TYPE_COLUMN)
+    current = _column(rows, CATEGORY_COLUMN)
+    notes = _column(rows, NOTE_COLUMN)
+    notes_lower = np.array([note.lower() for note in notes], dtype=object)
+    amounts = np.array([_amount(_value(row, AMOUNT_COLUMN)) for row in rows], dtype=float)
+
+    # Accounts repeat across thousands of rows, substring checks run once per distinct account
+    unique_accounts, account_ids = np.unique(accounts, return_inverse=True)
+
+    categories = np.full(len(rows), "MISC", dtype=object)
+    unassigned = np.ones(len(rows), dtype=bool)
+    for rule in rules:
+        mask = unassigned.copy()
+        if rule.txn_type:
+            mask &= txn_types == rule.txn_type
+        if rule.account_id_contains:
+            pattern = rule.account_id_contains.lower()
+            mask &= np.array([pattern in account for account in unique_accounts], dtype=bool)[account_ids]
+        # An unreadable (NaN) amount compares False, so it never satisfies a min/max bound
+        with np.errstate(invalid="ignore"):
+            if rule.min_amount is not None:
+                mask &= amounts >= rule.min_amount
+            if rule.max_amount is not None:
+                mask &= amounts <= rule.max_amount
+
+        candidates = np.flatnonzero(mask)
+        if len(candidates) and rule.note_contains:
+            pattern = rule.note_contains.lower()
+            candidates = candidates[np.fromiter((pattern in notes_lower[i] for i in candidates), dtype=bool, count=len(candidates))]
+        if len(candidates) and rule.regex_note:
+            try:
+                regex = re.compile(rule.regex_note, re.IGNORECASE)
+            except re.error:
+                continue
+            candidates = candidates[np.fromiter((regex.search(notes[i]) is not None for i in candidates), dtype=bool, count=len(candidates))]
+
+        categories[candidates] = rule.category
+        unassigned[candidates] = False
+
+    changed = np.flatnonzero(categories != current)
+    return [(int(i), categories[i]) for i in changed]
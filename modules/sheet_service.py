@@ -1,11 +1,13 @@
 import gspread
 from google.oauth2.service_account import Credentials
-from typing import List
+from gspread.utils import ValueRenderOption, rowcol_to_a1
+from typing import Any, List, Tuple
 from utils import log_and_collect
 from domain.email import Email
 from domain.parsed_email import ParsedEmail
 from domain.category_rule import CategoryRule
-from constants import SHEETS_SERVICE_ACCOUNT_FILE, SHEETS_SCOPES, SHEETS_SPREADSHEET_ID
+from modules.recategorizer import CATEGORY_COLUMN
+from constants import SHEETS_SERVICE_ACCOUNT_FILE, SHEETS_SCOPES, SHEETS_SPREADSHEET_ID, SHEETS_BATCH_UPDATE_RANGES
 
 
 class SheetService:
@@ -44,6 +46,38 @@ class SheetService:
 
         return [email for email in emails if email.get_message_id() not in processed_ids]
 
+    def load_transaction_rows(self) -> List[List[Any]]:
+        try:
+            # Unformatted, so amounts come back as numbers whatever the sheet's number format
+            rows = self.transaction_sheet.get_all_values(value_render_option=ValueRenderOption.unformatted)
+            return rows[1:]  # Row 1 is the header
+        except Exception as e:
+            raise RuntimeError(f"❌ Failed to read from transactions sheet: {e}")
+
+    def update_transaction_categories(self, updates: List[Tuple[int, str]], log_store: List[str]):
+        """
+        Writes (row position, category) pairs from recategorize_rows back to the category column.
+        Consecutive rows are merged into one range and ranges are sent in batched updates.
+        """
+        ranges = []
+        for position, category in sorted(updates):
+            sheet_row = position + 2  # Positions exclude the header row, sheet rows start at 1
+            if ranges and ranges[-1]["end"] == sheet_row - 1:
+                ranges[-1]["end"] = sheet_row
+                ranges[-1]["values"].append([category])
+            else:
+                ranges.append({"start": sheet_row, "end": sheet_row, "values": [[category]]})
+
+        log_and_collect(f"✅ Updating {len(updates)} transaction categories in {len(ranges)} ranges", log_store)
+
+        column = CATEGORY_COLUMN + 1  # A1 columns start at 1
+        data = [
+            {"range": f"{rowcol_to_a1(r['start'], column)}:{rowcol_to_a1(r['end'], column)}", "values": r["values"]}
+            for r in ranges
+        ]
+        for start in range(0, len(data), SHEETS_BATCH_UPDATE_RANGES):
+            self.transaction_sheet.batch_update(data[start:start + SHEETS_BATCH_UPDATE_RANGES], value_input_option="USER_ENTERED")  # type: ignore
+
     def write_transactions(self, parsed_emails: List[ParsedEmail], log_store: List[str]):
         transaction_rows: List[List[str]] = []
 
@@ -0,0 +1,40 @@
+import os
+import json
+import hashlib
+from typing import List, Optional
+from constants import STATE_FILE
+from domain.email_config import EmailConfig
+
+GMAIL_HISTORY_IDS = 'gmail_history_ids'
+
+def load_state(path: str = STATE_FILE) -> dict:
+    if not os.path.exists(path):
+        return {}
+    with open(path, 'r') as f:
+        return json.load(f)
+
+def save_state(state: dict, path: str = STATE_FILE):
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    temp_path = path + '.tmp'
+    with open(temp_path, 'w') as f:
+        json.dump(state, f, indent=2)
+    os.replace(temp_path, path)
+
+# Checkpoints are keyed by the Gmail query plus a fingerprint of the enabled configs, so that
+# changing the date window, adding a config (even one reusing a sender already in the query)
+# or editing its senders or subject keywords falls back to a full scan.
+def checkpoint_key(query: str, email_configs: List[EmailConfig]) -> str:
+    fingerprint = sorted(
+        [config.id, sorted(config.from_addresses), sorted(config.subject_keywords)]
+        for config in email_configs if config.run
+    )
+    digest = hashlib.sha256(json.dumps(fingerprint).encode('utf-8')).hexdigest()[:16]
+    return f"{query} configs:{digest}"
+
+def get_history_checkpoint(key: str, path: str = STATE_FILE) -> Optional[str]:
+    return load_state(path).get(GMAIL_HISTORY_IDS, {}).get(key)
+
+def save_history_checkpoint(key: str, history_id: str, path: str = STATE_FILE):
+    state = load_state(path)
+    state.setdefault(GMAIL_HISTORY_IDS, {})[key] = history_id
+    save_state(state, path)
@@ -1,10 +1,20 @@
 import json
-from typing import List
+import math
+from collections import defaultdict
+from functools import lru_cache
+from typing import Dict, List, Tuple
 from domain.transaction import Transaction
 from domain.parsed_email import ParsedEmail  # Assuming you defined ParsedEmail in a domain module
 from pprint import pprint
 from difflib import SequenceMatcher
 
+# Above this many (expected, generated) pairs a group is paired greedily, the assignment is O(n^2 m)
+MAX_ASSIGNMENT_CELLS = 100 * 100
+# transaction_key fields leftover rows must share to be paired, one grouping after the other:
+# amount is the most selective so (amount, txn_type) and (date, amount) blocks go first, then
+# (date, txn_type), then the full key for rows whose note alone changed
+LEFTOVER_GROUPINGS = [(1, 2), (0, 1), (0, 2), (0, 1, 2)]
+
 
 def validate_parsed_emails(expected_json_path: str, generated_parsed_emails: List[ParsedEmail]):
     with open(expected_json_path, 'r') as f:
@@ -45,41 +55,202 @@ def validate_generated_vs_expected(generated_data: List[ParsedEmail], expected_d
     return mismatches
 
 
-def compare_transactions(expected: List[dict], generated: List[Transaction], note_similarity_threshold: float = 0.8):
-    def sort_key(tx):
-        return (tx["date"], tx["amount"], tx["note"], tx["txn_type"])
+def min_cost_assignment(cost: List[List[float]]) -> List[Tuple[int, int]]:
+    """
+    Hungarian algorithm: pairs every row with a distinct column (or every column with a
+    distinct row when there are fewer columns) at minimum total cost, in O(n^2 m).
+    """
+    if not cost or not cost[0]:
+        return []
+    transposed = len(cost) > len(cost[0])
+    if transposed:
+        cost = [list(column) for column in zip(*cost)]
+
+    n, m = len(cost), len(cost[0])
+    u = [0.0] * (n + 1)
+    v = [0.0] * (m + 1)
+    owner = [0] * (m + 1)  # owner[j]: row (1-based) assigned to column j, 0 when free
+    way = [0] * (m + 1)
+    for i in range(1, n + 1):
+        owner[0] = i
+        j0 = 0
+        min_v = [math.inf] * (m + 1)
+        used = [False] * (m + 1)
+        while True:
+            used[j0] = True
+            i0, delta, j1 = owner[j0], math.inf, 0
+            for j in range(1, m + 1):
+                if not used[j]:
+                    reduced = cost[i0 - 1][j - 1] - u[i0] - v[j]
+                    if reduced < min_v[j]:
+                        min_v[j], way[j] = reduced, j0
+                    if min_v[j] < delta:
+                        delta, j1 = min_v[j], j
+            for j in range(m + 1):
+                if used[j]:
+                    u[owner[j]] += delta
+                    v[j] -= delta
+                else:
+                    min_v[j] -= delta
+            j0 = j1
+            if owner[j0] == 0:
+                break
+        while j0:
+            j1 = way[j0]
+            owner[j0] = owner[j1]
+            j0 = j1
+
+    pairs = [(owner[j] - 1, j - 1) for j in range(1, m + 1) if owner[j]]
+    return [(j, i) for i, j in pairs] if transposed else pairs
+
+
+def greedy_assignment(cost: List[List[float]]) -> List[Tuple[int, int]]:
+    """Pairs rows and columns in increasing cost order; not always optimal, but O(nm log nm)."""
+    pairs = sorted((value, i, j) for i, row in enumerate(cost) for j, value in enumerate(row))
+    used_rows, used_columns = set(), set()
+    assignment = []
+    for _, i, j in pairs:
+        if i not in used_rows and j not in used_columns:
+            used_rows.add(i)
+            used_columns.add(j)
+            assignment.append((i, j))
+    return sorted(assignment)
+
+
+def normalize_note(tx: dict) -> str:
+    return (tx.get("note") or "").strip().lower()
+
+
+@lru_cache(maxsize=65536)
+def note_ratio(e_note: str, g_note: str) -> float:
+    return SequenceMatcher(None, e_note, g_note).ratio()
+
+
+def note_similarity(e_tx: dict, g_tx: dict) -> float:
+    e_note, g_note = normalize_note(e_tx), normalize_note(g_tx)
+    if e_note == g_note:
+        return 1.0
+    if not e_note or not g_note:
+        return 0.0
+    return note_ratio(e_note, g_note)
+
+
+def transaction_key(tx: dict) -> Tuple[str, float, str]:
+    return (tx["date"], round(float(tx["amount"]), 2), tx["txn_type"])
+
+
+def describe_transaction(tx: dict) -> str:
+    return f"date={tx['date']}, amount={tx['amount']}, type={tx['txn_type']}, note='{tx.get('note', '')}'"
 
-    expected_sorted = sorted(expected, key=sort_key)
-    generated_sorted = sorted([tx.dict() for tx in generated], key=sort_key)
 
+def differing_fields(e_tx: dict, g_tx: dict) -> List[str]:
+    return [
+        field for field, e_value, g_value in zip(["date", "amount", "txn_type"], transaction_key(e_tx), transaction_key(g_tx))
+        if e_value != g_value
+    ]
+
+
+def match_within_groups(groups: List[Tuple[List[int], List[int]]], expected: List[dict], generated: List[dict]) -> List[Tuple[int, int, float]]:
+    """
+    Solves a minimum-cost assignment inside each (expected rows, generated rows) group. The cost
+    is the note dissimilarity plus one per differing date/amount/txn_type field. Groups larger
+    than MAX_ASSIGNMENT_CELLS are paired greedily instead.
+    """
+    matches = []
+    for e_rows, g_rows in groups:
+        # Identical rows cost nothing, pair them up before solving for the rest
+        identical: Dict[tuple, List[int]] = defaultdict(list)
+        for g in g_rows:
+            identical[transaction_key(generated[g]) + (normalize_note(generated[g]),)].append(g)
+        paired = set()
+        remaining = []
+        for e in e_rows:
+            candidates = identical.get(transaction_key(expected[e]) + (normalize_note(expected[e]),))
+            if candidates:
+                g = candidates.pop(0)
+                paired.add(g)
+                matches.append((e, g, 1.0))
+            else:
+                remaining.append(e)
+        e_rows, g_rows = remaining, [g for g in g_rows if g not in paired]
+
+        if not e_rows or not g_rows:
+            continue
+        similarity = [[note_similarity(expected[e], generated[g]) for g in g_rows] for e in e_rows]
+        cost = [
+            [len(differing_fields(expected[e], generated[g])) + 1.0 - similarity[i][j] for j, g in enumerate(g_rows)]
+            for i, e in enumerate(e_rows)
+        ]
+        assign = min_cost_assignment if len(e_rows) * len(g_rows) <= MAX_ASSIGNMENT_CELLS else greedy_assignment
+        for i, j in assign(cost):
+            matches.append((e_rows[i], g_rows[j], similarity[i][j]))
+    return matches
+
+
+def leftover_blocks(kept_fields: Tuple[int, ...], e_rows: List[int], g_rows: List[int], expected: List[dict], generated: List[dict]) -> List[Tuple[List[int], List[int]]]:
+    """Groups leftover rows by the date/amount/txn_type fields at kept_fields; blocks with only one side are skipped."""
+    blocks: Dict[tuple, Tuple[List[int], List[int]]] = defaultdict(lambda: ([], []))
+    for rows, data, side in ((e_rows, expected, 0), (g_rows, generated, 1)):
+        for row in rows:
+            key = transaction_key(data[row])
+            blocks[tuple(key[field] for field in kept_fields)][side].append(row)
+    return [block for block in blocks.values() if block[0] and block[1]]
+
+
+def compare_transactions(expected: List[dict], generated: List[Transaction], note_similarity_threshold: float = 0.8):
+    generated = [tx.model_dump() for tx in generated]
     mismatches = []
-    if len(expected_sorted) != len(generated_sorted):
-        mismatches.append(f"Transaction count mismatch. Expected {len(expected_sorted)}, got {len(generated_sorted)}")
-        return mismatches
-
-    for i, (e_tx, g_tx) in enumerate(zip(expected_sorted, generated_sorted)):
-        tx_context = f"(generated: date={g_tx['date']}, amount={g_tx['amount']}, type={g_tx['txn_type']}, note='{g_tx['note']}')"
-
-        for field in ["date", "amount", "txn_type"]:
-            if e_tx[field] != g_tx[field]:
-                mismatches.append(
-                    f"Mismatch at index {i} on '{field}' → expected '{e_tx[field]}', got '{g_tx[field]}' {tx_context}"
-                )
-
-        # Fuzzy note comparison
-        e_note = e_tx.get("note", "").strip().lower()
-        g_note = g_tx.get("note", "").strip().lower()
-
-        if e_note and g_note:
-            similarity = SequenceMatcher(None, e_note, g_note).ratio()
-            if similarity < note_similarity_threshold:
-                mismatches.append(
-                    f"Mismatch at index {i}: note similarity {similarity:.2f} below threshold → "
-                    f"expected '{e_note}', got '{g_note}' {tx_context}"
-                )
-        elif e_note != g_note:
+    if len(expected) != len(generated):
+        mismatches.append(f"Transaction count mismatch. Expected {len(expected)}, got {len(generated)}")
+
+    # Pass 1: rows agreeing on date, amount and txn_type, paired by note similarity
+    buckets: Dict[tuple, Tuple[List[int], List[int]]] = defaultdict(lambda: ([], []))
+    for row, tx in enumerate(expected):
+        buckets[transaction_key(tx)][0].append(row)
+    for row, tx in enumerate(generated):
+        buckets[transaction_key(tx)][1].append(row)
+
+    changed = []
+    matched_e, matched_g = set(), set()
+    for e_row, g_row, similarity in match_within_groups(list(buckets.values()), expected, generated):
+        if similarity >= note_similarity_threshold:
+            matched_e.add(e_row)
+            matched_g.add(g_row)
+
+    # Pass 2: leftovers that differ in one key field or in the note are the same row, changed.
+    # Each block is solved on its own, so one systematic error (e.g. every date shifted)
+    # never chains the blocks into a single assignment over every leftover.
+    for kept_fields in LEFTOVER_GROUPINGS:
+        e_left = [row for row in range(len(expected)) if row not in matched_e]
+        g_left = [row for row in range(len(generated)) if row not in matched_g]
+        blocks = leftover_blocks(kept_fields, e_left, g_left, expected, generated)
+        for e_row, g_row, similarity in match_within_groups(blocks, expected, generated):
+            differing = differing_fields(expected[e_row], generated[g_row])
+            # A changed key field only counts as the same row when the note and the other two fields still agree
+            if differing and similarity < note_similarity_threshold:
+                continue
+            matched_e.add(e_row)
+            matched_g.add(g_row)
+            changed.append((e_row, g_row, differing, similarity))
+
+    for e_row, g_row, differing, similarity in sorted(changed):
+        e_tx, g_tx = expected[e_row], generated[g_row]
+        tx_context = f"(generated: {describe_transaction(g_tx)})"
+        for field in differing:
+            mismatches.append(
+                f"Changed row {e_row} on '{field}' → expected '{e_tx[field]}', got '{g_tx[field]}' {tx_context}"
+            )
+        if similarity < note_similarity_threshold:
             mismatches.append(
-                f"Mismatch at index {i}: note presence → expected '{e_note}', got '{g_note}' {tx_context}"
+                f"Changed row {e_row}: note similarity {similarity:.2f} below threshold → "
+                f"expected '{normalize_note(e_tx)}', got '{normalize_note(g_tx)}' {tx_context}"
             )
 
+    for e_row in range(len(expected)):
+        if e_row not in matched_e:
+            mismatches.append(f"Missing row {e_row} → expected {describe_transaction(expected[e_row])}")
+    for g_row in range(len(generated)):
+        if g_row not in matched_g:
+            mismatches.append(f"Extra row → generated {describe_transaction(generated[g_row])}")
+
     return mismatches
@@ -0,0 +1,43 @@
+from datetime import datetime
+from benchmarks.fixtures import FakeGmailService, build_pdf, statement_email_config
+from domain.email import Email
+from modules import attachment_service
+from modules.attachment_service import prefetch_unlocked_pdfs
+from modules.field_parser.pdf_document import PDFDocument
+
+
+def same_day_statements():
+    gmail = FakeGmailService()
+    config = statement_email_config("card", "card_0")
+    first, second = build_pdf([[[(40, "FIRST")]]], "secret"), build_pdf([[[(40, "SECOND")]]], "secret")
+    gmail.add_statement("m1", config, datetime(2025, 6, 1, 9), first)
+    gmail.add_statement("m2", config, datetime(2025, 6, 1, 18), second)
+    emails = [Email(config, gmail.messages_by_id[message_id]) for message_id in ("m1", "m2")]
+    assert emails[0].get_filename_prefix() == emails[1].get_filename_prefix()
+    return gmail, emails
+
+
+def assert_unlocked(unlocked):
+    assert set(unlocked) == {"m1", "m2"}
+    for message_id, text in (("m1", "FIRST"), ("m2", "SECOND")):
+        with PDFDocument(unlocked[message_id]) as document:
+            assert document.layout_text(0).strip() == text
+
+
+def test_statements_from_one_account_on_one_day_are_unlocked_separately(monkeypatch):
+    monkeypatch.setattr(attachment_service, "get_pdf_password", lambda account_id: "secret")
+    gmail, emails = same_day_statements()
+    assert_unlocked(prefetch_unlocked_pdfs(emails + emails[:1], lambda: gmail))
+
+
+def test_saved_copies_are_read_back(monkeypatch, tmp_path):
+    monkeypatch.setattr(attachment_service, "get_pdf_password", lambda account_id: "secret")
+    monkeypatch.setattr(attachment_service, "SAVE_UNLOCKED_PDFS", True)
+    monkeypatch.setattr(attachment_service, "PDF_OUTPUT_DIRECTORY", str(tmp_path))
+    gmail, emails = same_day_statements()
+    assert_unlocked(prefetch_unlocked_pdfs(emails, lambda: gmail))
+    assert len(list(tmp_path.glob("*.pdf"))) == 2
+
+    # Nothing is downloaded or unlocked again
+    monkeypatch.setattr(attachment_service, "get_pdf_password", lambda account_id: "wrong")
+    assert_unlocked(prefetch_unlocked_pdfs(emails, lambda: FakeGmailService()))
@@ -0,0 +1,43 @@
+import random
+from domain.category_rule import CategoryRule
+from domain.parsed_email import ParsedEmail
+from domain.transaction import Transaction
+from modules.category_engine import CategoryRuleEngine
+
+NOTES = ["UPI/SWIGGY/FOOD", "upi/zomato", "AMAZON PAY", "Uber India", "NEFT SALARY ACME", "ATM WDL", "IRCTC", ""]
+ACCOUNTS = ["hdfc_bank_account", "sbi_bank_account", "hdfc_credit_card", "icici_card"]
+
+
+def random_rule(rng: random.Random, priority: int) -> CategoryRule:
+    return CategoryRule(
+        priority=priority,
+        txn_type=rng.choice([None, None, "DEBIT", "CREDIT"]),
+        account_id_contains=rng.choice([None, None, "hdfc", "CARD", "bank", ""]),
+        note_contains=rng.choice([None, None, "swiggy", "UPI", "amazon", "acme", "wdl", ""]),
+        regex_note=rng.choice([None, None, None, r"^upi", r"\bindia\b", r"sal.*acme", "[unclosed"]),
+        min_amount=rng.choice([None, None, 100.0, 500.0, 499.99]),
+        max_amount=rng.choice([None, None, 500.0, 5000.0, 100.0]),
+        category=rng.choice(["LIVING", "FUN", "TRAVEL", "SHOPPING", "REVENUE"]),
+    )
+
+
+def test_engine_matches_the_first_rule_that_matches():
+    rng = random.Random(0)
+    for _ in range(100):
+        rules = [random_rule(rng, priority) for priority in range(rng.randint(0, 30))]
+        engine = CategoryRuleEngine(rules)
+        for _ in range(30):
+            transaction = Transaction(
+                date="2025-06-01",
+                amount=rng.choice([50.0, 100.0, 499.99, 500.0, 1200.0, 5000.0, 9000.0]),
+                note=rng.choice(NOTES),
+                txn_type=rng.choice(["DEBIT", "CREDIT"]),
+                category="MISC",
+                reason="test",
+            )
+            parsed_email = ParsedEmail(
+                execution_id="test", message_id="m1", email_date="2025-06-30",
+                account_id=rng.choice(ACCOUNTS), transactions=[transaction], status="success",
+            )
+            expected = next((rule for rule in rules if rule.matches(transaction, parsed_email)), None)
+            assert engine.match(transaction, parsed_email) is expected
@@ -0,0 +1,37 @@
+from domain.transaction import Transaction
+from modules.field_parser.chunker import amount_appears_in, drop_seam_duplicates
+
+
+def transaction(amount: float, note: str = "UPI") -> Transaction:
+    return Transaction(date="2025-06-01", amount=amount, note=note, txn_type="DEBIT", category="MISC", reason="")
+
+
+def test_amount_appears_in_any_digit_grouping():
+    assert amount_appears_in(123456.78, "01/06/2025 NEFT 1,23,456.78")
+    assert amount_appears_in(123456.78, "01/06/2025 NEFT 123,456.78")
+    assert amount_appears_in(123456.78, "01/06/2025 NEFT 123456.78")
+    assert amount_appears_in(1500.0, "01/06/2025 NEFT 1,500")
+    assert not amount_appears_in(23456.78, "01/06/2025 NEFT 1,23,456.78")
+
+
+def test_seam_duplicates_with_indian_grouping_are_dropped():
+    previous = [transaction(500.0, "ATM"), transaction(123456.78, "NEFT SALARY")]
+    current = [transaction(123456.78, "NEFT SALARY"), transaction(99.0)]
+    kept = drop_seam_duplicates(previous, current, "01/06/2025 NEFT SALARY 1,23,456.78 2,34,567.00")
+    assert [txn.note for txn in kept] == ["UPI"]
+
+
+def test_only_rows_read_from_the_overlap_are_dropped():
+    # Same day, same amount: only B is printed in the overlap, so only its repeat goes
+    previous = [transaction(100.0, "UPI A TEA"), transaction(100.0, "UPI B COFFEE")]
+    current = [transaction(100.0, "UPI B COFFEE"), transaction(100.0, "UPI C SNACKS")]
+    kept = drop_seam_duplicates(previous, current, "01/06/2025 UPI B COFFEE 100.00")
+    assert [txn.note for txn in kept] == ["UPI C SNACKS"]
+
+
+def test_each_overlap_line_drops_one_repeat():
+    previous = [transaction(100.0, "UPI COFFEE"), transaction(100.0, "UPI COFFEE")]
+    current = [transaction(100.0, "UPI COFFEE"), transaction(100.0, "UPI COFFEE"), transaction(100.0, "UPI COFFEE")]
+    overlap = "01/06/2025 UPI COFFEE 100.00\n01/06/2025 UPI COFFEE 100.00"
+    assert len(drop_seam_duplicates(previous, current, overlap)) == 1
+    assert len(drop_seam_duplicates(previous, current, "01/06/2025 UPI COFFEE 100.00")) == 2
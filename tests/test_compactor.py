@@ -0,0 +1,86 @@
+import json
+import pytest
+from benchmarks.fixtures import build_pdf, fake_llm_output, synthetic_statement
+from domain.field_parser_config import BetweenPDFExtractorConfig, LayoutCompactionConfig
+from modules.field_parser.compactor import compact_layout_text
+from modules.field_parser.extractor import extract_from_pdf
+from modules.field_parser.pdf_document import PDFDocument
+
+BETWEEN = BetweenPDFExtractorConfig(type="between", start="Txn Date", end=None)
+HEADER = [(40, "Txn Date"), (100, "Narration"), (330, "Withdrawal"), (410, "Deposit"), (490, "Balance")]
+
+
+def statement_page(rows, page_label="Page 1 of 1"):
+    return [
+        [(40, "ACME BANK LIMITED")],
+        HEADER,
+        *rows,
+        [(40, "This is a computer generated statement.")],
+        [(450, page_label)],
+    ]
+
+
+def compact(pages):
+    with PDFDocument(build_pdf(pages)) as document:
+        return compact_layout_text(LayoutCompactionConfig(), extract_from_pdf(BETWEEN, document), document)
+
+
+def test_empty_columns_are_kept():
+    lines = compact([statement_page([
+        [(40, "01/06/2025"), (100, "SALARY ACME"), (410, "50,000.00"), (490, "60,000.00")],
+        [(40, "02/06/2025"), (100, "UPI SWIGGY"), (330, "500.00"), (490, "59,500.00")],
+    ])])[0].split("\n")
+    assert lines[0] == "Txn Date | Narration | Withdrawal | Deposit | Balance"
+    assert lines[1] == "01/06/2025 | SALARY ACME |  | 50,000.00 | 60,000.00"
+    assert lines[2] == "02/06/2025 | UPI SWIGGY | 500.00 |  | 59,500.00"
+
+
+def test_columns_separated_by_one_layout_space_stay_apart():
+    # The narration ends one layout character before the withdrawal starts
+    lines = compact([statement_page([
+        [(40, "01/06/2025"), (100, "ELECTRICITY BILL BESCOM/709067"), (330, "19,127.80"), (490, "627,756.67")],
+    ])])[0].split("\n")
+    assert lines[1] == "01/06/2025 | ELECTRICITY BILL BESCOM/709067 | 19,127.80 |  | 627,756.67"
+
+
+def test_column_only_the_header_names_is_kept():
+    lines = compact([statement_page([
+        [(40, "01/06/2025"), (100, "UPI SWIGGY"), (330, "500.00"), (490, "59,500.00")],
+        [(40, "02/06/2025"), (100, "ATM WDL MG ROAD"), (330, "2,000.00"), (490, "57,500.00")],
+    ])])[0].split("\n")
+    assert lines[1] == "01/06/2025 | UPI SWIGGY | 500.00 |  | 59,500.00"
+    assert lines[2] == "02/06/2025 | ATM WDL MG ROAD | 2,000.00 |  | 57,500.00"
+
+
+def test_boilerplate_is_dropped():
+    row = [(40, "01/06/2025"), (100, "UPI SWIGGY"), (330, "500.00"), (490, "59,500.00")]
+    assert "Page 1 of 1" not in compact([statement_page([row])])[0]
+
+
+def test_repeated_footer_is_dropped_but_every_page_keeps_its_header():
+    first, second = compact([
+        statement_page([[(40, "01/06/2025"), (100, "UPI SWIGGY"), (330, "500.00"), (490, "59,500.00")]], "Page 1 of 2"),
+        statement_page([[(40, "03/06/2025"), (100, "UPI SWIGGY"), (330, "500.00"), (490, "59,000.00")]], "Page 2 of 2"),
+    ])
+    assert first.startswith("Txn Date | Narration") and second.startswith("Txn Date | Narration")
+    assert "computer generated" in first and "computer generated" not in second
+
+
+def typed_transactions(pages):
+    return [
+        (txn["date"], txn["amount"], txn["txn_type"], txn["note"])
+        for page in pages for txn in json.loads(fake_llm_output(page))["transactions"]
+    ]
+
+
+@pytest.mark.parametrize("kind", ["bank", "card"])
+@pytest.mark.parametrize("seed", [0, 3])
+def test_compaction_keeps_the_transactions(kind, seed):
+    pdf_bytes, rows = synthetic_statement(kind, 2, 40, seed=seed)
+    with PDFDocument(pdf_bytes) as document:
+        pages = extract_from_pdf(BETWEEN, document)
+        compacted = compact_layout_text(LayoutCompactionConfig(), pages, document)
+
+    expected = [(row["date"], row["amount"], row["txn_type"], row["note"]) for row in rows]
+    assert typed_transactions(pages) == expected
+    assert typed_transactions(compacted) == expected
@@ -0,0 +1,38 @@
+import random
+from domain.email_config import EmailConfig
+from modules.aho_corasick import AhoCorasick
+from modules.email_matcher import EmailConfigMatcher
+
+SENDERS = ["alerts@hdfcbank.net", "hdfcbank.net", "cards@icici.com", "sbi.co.in", "statements@axis.com", "bank"]
+KEYWORDS = ["statement", "e-statement", "credit card", "account", "hdfc bank", ""]
+
+
+def random_configs(rng: random.Random):
+    return [
+        EmailConfig(
+            id=f"config_{i}",
+            from_addresses=rng.sample(SENDERS, rng.randint(1, 2)),
+            subject_keywords=rng.sample(KEYWORDS, rng.randint(1, 2)),
+            field_parsers={},
+            run=True,
+        )
+        for i in range(rng.randint(1, 8))
+    ]
+
+
+def test_aho_corasick_finds_every_substring_pattern():
+    rng = random.Random(0)
+    for _ in range(300):
+        patterns = ["".join(rng.choice("ab") for _ in range(rng.randint(0, 4))) for _ in range(rng.randint(1, 6))]
+        text = "".join(rng.choice("abc") for _ in range(rng.randint(0, 12)))
+        assert set(AhoCorasick(patterns).find(text)) == {i for i, pattern in enumerate(patterns) if pattern in text}
+
+
+def test_matcher_returns_the_first_matching_config():
+    rng = random.Random(1)
+    for _ in range(500):
+        configs = random_configs(rng)
+        from_header = f"Statements <{rng.choice(SENDERS + ['noreply@other.com']).upper()}>"
+        subject = f"Your {rng.choice(KEYWORDS + ['invoice'])} for June".title()
+        expected = next((config for config in configs if config.matches_email(from_header, subject)), None)
+        assert EmailConfigMatcher(configs).match(from_header, subject) is expected
@@ -0,0 +1,66 @@
+import json
+import httplib2
+from googleapiclient.errors import HttpError
+from modules import email_service
+from modules.email_service import fetch_messages, is_retryable
+
+
+def http_error(status: int, reason: str = "") -> HttpError:
+    content = {"error": {"code": status, "message": "error", "errors": [{"reason": reason}] if reason else []}}
+    return HttpError(httplib2.Response({"status": status}), json.dumps(content).encode("utf-8"))
+
+
+def test_rate_limit_403_is_retryable():
+    assert is_retryable(http_error(403, "rateLimitExceeded"))
+    assert is_retryable(http_error(403, "userRateLimitExceeded"))
+    assert is_retryable(http_error(429)) and is_retryable(http_error(503))
+
+
+def test_other_errors_are_not_retryable():
+    assert not is_retryable(http_error(403, "insufficientPermissions"))
+    assert not is_retryable(HttpError(httplib2.Response({"status": 403}), b"not json"))
+    assert not is_retryable(http_error(400))
+    assert not is_retryable(ValueError("boom"))
+
+
+class FlakyGmail:
+    """Answers every messages.get in a batch, the first attempt with a 403 rate limit."""
+
+    def __init__(self):
+        self.attempts = 0
+
+    def new_batch_http_request(self, callback):
+        gmail = self
+
+        class Batch:
+            def __init__(self):
+                self.ids = []
+
+            def add(self, request, request_id):
+                self.ids.append(request_id)
+
+            def execute(self):
+                gmail.attempts += 1
+                for request_id in self.ids:
+                    if gmail.attempts == 1:
+                        callback(request_id, None, http_error(403, "userRateLimitExceeded"))
+                    else:
+                        callback(request_id, {"id": request_id}, None)
+
+        return Batch()
+
+    def users(self):
+        return self
+
+    def messages(self):
+        return self
+
+    def get(self, **kwargs):
+        return kwargs
+
+
+def test_fetch_messages_retries_rate_limited_403(monkeypatch):
+    monkeypatch.setattr(email_service.time, "sleep", lambda seconds: None)
+    gmail = FlakyGmail()
+    assert fetch_messages(gmail, ["m1", "m2"]) == {"m1": {"id": "m1"}, "m2": {"id": "m2"}}
+    assert gmail.attempts == 2
@@ -0,0 +1,31 @@
+from modules.field_parser.extraction_cache import ExtractionCache, MISSING
+
+
+def test_round_trip_and_none_values(tmp_path):
+    cache = ExtractionCache(str(tmp_path))
+    assert cache.get("page_artifacts", "abc") is MISSING
+    cache.put({"layout_text": {"0": "Txn Date"}}, "page_artifacts", "abc")
+    cache.put(None, "extractor_result", "abc")
+    assert cache.get("page_artifacts", "abc") == {"layout_text": {"0": "Txn Date"}}
+    assert cache.get("extractor_result", "abc") is None
+
+
+def test_least_recently_used_entries_are_evicted(tmp_path):
+    entry_bytes = len(b'{"value": "xxxxxxxxxx"}')
+    cache = ExtractionCache(str(tmp_path), max_bytes=2 * entry_bytes)
+    cache.put("x" * 10, "a")
+    cache.put("x" * 10, "b")
+    cache.get("a")
+    cache.put("x" * 10, "c")
+    assert cache.get("a") == "x" * 10 and cache.get("c") == "x" * 10
+    assert cache.get("b") is MISSING
+    assert sum(1 for path in tmp_path.rglob("*.json")) == 2
+
+
+def test_size_is_tracked_across_instances(tmp_path):
+    entry_bytes = len(b'{"value": "xxxxxxxxxx"}')
+    ExtractionCache(str(tmp_path)).put("x" * 10, "a")
+    cache = ExtractionCache(str(tmp_path), max_bytes=entry_bytes)
+    assert cache.get("a") == "x" * 10
+    cache.put("x" * 10, "b")
+    assert cache.get("a") is MISSING and cache.get("b") == "x" * 10
@@ -0,0 +1,35 @@
+from benchmarks.fixtures import build_pdf
+from domain.field_parser_config import BetweenPDFExtractorConfig
+from modules.field_parser.extractor import extract_from_pdf
+from modules.field_parser.pdf_document import PDFDocument
+
+PAGES = [
+    [[(40, "ACME BANK LIMITED")], [(40, "Dear customer, your statement is attached.")]],
+    [[(40, "Account summary")], [(40, "Closing Balance"), (300, "59,500.00")]],
+    [
+        [(40, "Txn Date"), (100, "Narration"), (330, "Withdrawal"), (490, "Balance")],
+        [(40, "01/06/2025"), (100, "UPI SWIGGY"), (330, "500.00"), (490, "59,500.00")],
+        [(40, "End of statement")],
+    ],
+    [[(40, "Terms and conditions")]],
+]
+
+
+def between(**options):
+    return BetweenPDFExtractorConfig(type="between", start="Txn Date", end="End of statement", **options)
+
+
+def test_skip_to_start_only_layout_parses_pages_from_the_first_start_marker():
+    with PDFDocument(build_pdf(PAGES)) as document:
+        expected = extract_from_pdf(between(), document)
+    with PDFDocument(build_pdf(PAGES)) as document:
+        assert extract_from_pdf(between(skip_to_start=True), document) == expected
+        assert sorted(document._layout_text) == [2]
+    assert len(expected) == 1 and "UPI SWIGGY" in expected[0]
+
+
+def test_skip_to_start_reads_every_page_when_no_page_has_the_marker():
+    config = BetweenPDFExtractorConfig(type="between", start="Value Date", end=None, skip_to_start=True)
+    with PDFDocument(build_pdf(PAGES)) as document:
+        assert extract_from_pdf(config, document) == []
+        assert sorted(document._layout_text) == [0, 1, 2, 3]
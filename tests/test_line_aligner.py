@@ -0,0 +1,60 @@
+import random
+from domain.transaction import Transaction
+from modules.field_parser.field_parser_utils import fuzzy_match_score
+from modules.field_parser.line_aligner import LineAligner, lcs_length, transaction_repr
+
+WORDS = ["UPI", "SWIGGY", "ZOMATO", "NEFT", "SALARY", "AMAZON", "IMPS", "ATM", "WDL", "Cr", "Dr", "Dr.", "/", "-"]
+
+
+def reference_align(lines, txn):
+    """The exhaustive loop populate_alignment_scores ran before LineAligner: first best line wins."""
+    best_score, best_line = 0.0, ""
+    for line in lines:
+        score = fuzzy_match_score(line, transaction_repr(txn))
+        if score > best_score:
+            best_score, best_line = score, line
+    return best_score, best_line
+
+
+def random_line(rng: random.Random) -> str:
+    parts = [f"{rng.randint(1, 28):02d}/06/2025", " ".join(rng.choices(WORDS, k=rng.randint(0, 4)))]
+    parts += [f"{rng.choice([12.5, 499.0, 1200.0, 45000.75, rng.uniform(1, 9999)]):,.2f}", rng.choice(["", "Cr", "Dr"])]
+    return "  ".join(rng.sample(parts, rng.randint(0, len(parts))))
+
+
+def random_transaction(rng: random.Random) -> Transaction:
+    return Transaction(
+        date=f"2025-06-{rng.randint(1, 28):02d}",
+        amount=rng.choice([12.5, 499.0, 1200.0, 45000.75, round(rng.uniform(1, 9999), 2)]),
+        note=" ".join(rng.choices(WORDS, k=rng.randint(0, 3))),
+        txn_type=rng.choice(["DEBIT", "CREDIT"]),
+        category="MISC",
+        reason="test",
+    )
+
+
+def test_lcs_length_matches_dynamic_programming():
+    rng = random.Random(0)
+    for _ in range(500):
+        a = "".join(rng.choices("abc ", k=rng.randint(0, 15)))
+        b = "".join(rng.choices("abcd", k=rng.randint(0, 15)))
+        table = [[0] * (len(b) + 1) for _ in range(len(a) + 1)]
+        for i in range(len(a)):
+            for j in range(len(b)):
+                table[i + 1][j + 1] = table[i][j] + 1 if a[i] == b[j] else max(table[i][j + 1], table[i + 1][j])
+        masks = {}
+        for i, char in enumerate(b):
+            masks[char] = masks.get(char, 0) | 1 << i
+        assert lcs_length(a, masks, len(b)) == table[len(a)][len(b)]
+
+
+def test_align_matches_the_exhaustive_loop():
+    rng = random.Random(1)
+    for _ in range(60):
+        lines = [random_line(rng) for _ in range(rng.randint(0, 40))]
+        # Duplicate lines make ties, which must still go to the first one
+        lines += rng.sample(lines, min(len(lines), 5))
+        aligner = LineAligner(lines)
+        for _ in range(10):
+            txn = random_transaction(rng)
+            assert aligner.align(txn) == reference_align(lines, txn)
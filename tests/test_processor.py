@@ -0,0 +1,125 @@
+import json
+import pytest
+from types import SimpleNamespace
+from domain.field_parser_config import TieredTransactionsProcessorUsingLLMConfig, TransactionsProcessorUsingLayoutConfig, TransactionsProcessorUsingLLMConfig
+from domain.transaction import Transaction
+from modules.field_parser import chunker, processor
+
+LAYOUT = TransactionsProcessorUsingLayoutConfig(
+    type="layout",
+    row_pattern=r"(?P<date>\d{2}/\d{2}/\d{4}) (?P<note>\S+) (?P<amount>[\d,.]+)$",
+    row_start_pattern=r"\d{2}/\d{2}/\d{4}",
+)
+
+
+def test_layout_fallback_pages_are_packed(monkeypatch):
+    monkeypatch.setattr(chunker, "count_tokens", lambda text: len(text.split()))
+    requests = []
+
+    def fake_extract(config, inputs):
+        requests.append(inputs)
+        return [
+            ([Transaction(date="2025-06-02", amount=float(len(text)), note=text, txn_type="DEBIT", category="MISC", reason="")], 0.9, "llm")
+            for text in inputs
+        ]
+
+    monkeypatch.setattr(processor, "extract_transactions_per_input", fake_extract)
+    pages = [
+        "01/06/2025 FIRST 10.00",
+        "02/06/2025 SECOND unparseable",
+        "03/06/2025 THIRD unparseable",
+        "04/06/2025 FOURTH 40.00",
+        "05/06/2025 FIFTH unparseable",
+    ]
+    transactions, message = processor.process_transactions_using_layout(LAYOUT, "transactions", pages)
+
+    # Consecutive fallback pages share one request, a separated one gets its own; all go out together
+    assert requests == [[pages[1] + "\n\n" + pages[2], pages[4]]]
+    assert [txn.note for txn in transactions] == ["FIRST", pages[1] + "\n\n" + pages[2], "FOURTH", pages[4]]
+    assert "pages 2-3: llm" in message and "page 5: llm" in message
+
+
+def test_unmatched_dated_row_falls_back_by_default(monkeypatch):
+    monkeypatch.setattr(chunker, "count_tokens", lambda text: len(text.split()))
+    requests = []
+    monkeypatch.setattr(processor, "extract_transactions_per_input", lambda config, inputs: requests.append(inputs) or [([], 0.9, "llm") for _ in inputs])
+    config = TransactionsProcessorUsingLayoutConfig(type="layout", row_pattern=LAYOUT.row_pattern)
+    pages = ["01/06/2025 FIRST 10.00\n02-Jun-2025 SECOND 20.00\nClosing balance 30.00", "03/06/2025 THIRD 30.00"]
+
+    processor.process_transactions_using_layout(config, "transactions", pages)
+    assert requests == [[pages[0]]]
+
+
+class DictCache(dict):
+    def get(self, key):
+        return dict.get(self, key)
+
+    def put(self, key, output_text):
+        self[key] = output_text
+
+
+class ScriptedRunner:
+    def __init__(self, outputs):
+        self.outputs = outputs
+
+    def create_responses(self, model, system_message, schema, schema_name, input_queries):
+        return [SimpleNamespace(output_text=self.outputs[query]) for query in input_queries]
+
+
+def test_parsed_responses_are_cached_when_another_fails(monkeypatch):
+    cache = DictCache()
+    good = json.dumps({"transactions": [], "confidence": 0.9})
+    monkeypatch.setattr(processor, "get_llm_response_cache", lambda: cache)
+    monkeypatch.setattr(processor, "get_llm_runner", lambda: ScriptedRunner({"page 1": good, "page 2": "not json", "page 3": good}))
+    monkeypatch.setattr(processor, "append_eval_jsonl", lambda *args: None)
+    monkeypatch.setattr(processor, "count_tokens", lambda text: len(text.split()))
+    config = TransactionsProcessorUsingLLMConfig(type="llm")
+
+    with pytest.raises(ValueError, match="page 2"):
+        processor.extract_transactions_per_input(config, ["page 1", "page 2", "page 3"])
+    assert sorted(cache.values()) == [good, good]
+
+
+def debit(date, note, amount):
+    return Transaction(date=date, amount=amount, note=note, txn_type="DEBIT", category="MISC", reason="")
+
+
+def test_tiered_llm_escalates_only_the_failing_requests(monkeypatch):
+    monkeypatch.setattr(chunker, "count_tokens", lambda text: len(text.split()))
+    pages = [
+        "01/06/2025 SWIGGY 500.00",
+        "02/06/2025 ZOMATO 250.00",
+        "03/06/2025 UBER 120.00",
+        "04/06/2025 AMAZON 999.00",
+    ]
+    small_results = {
+        pages[0]: ([debit("2025-06-01", "SWIGGY", 500.0)], 0.95),
+        # Low confidence
+        pages[1]: ([debit("2025-06-02", "ZOMATO", 250.0)], 0.5),
+        # Confident, but the transaction is not in its input
+        pages[2]: ([debit("2025-07-09", "NETFLIX PREMIUM", 1234.56)], 0.95),
+        pages[3]: ([debit("2025-06-04", "AMAZON", 999.0)], 0.95),
+    }
+    large_results = {
+        pages[1]: ([debit("2025-06-02", "ZOMATO LARGE", 250.0)], 0.99),
+        pages[2]: ([debit("2025-06-03", "UBER LARGE", 120.0)], 0.99),
+    }
+    requests = []
+
+    def fake_extract(config, inputs):
+        requests.append((config.model, inputs))
+        results = small_results if config.model == "small" else large_results
+        return [(*results[text], config.model) for text in inputs]
+
+    monkeypatch.setattr(processor, "extract_transactions_per_input", fake_extract)
+    config = TieredTransactionsProcessorUsingLLMConfig(type="tiered_llm", small_model="small", large_model="large", max_input_tokens=5)
+    transactions, message = processor.process_transactions_using_tiered_llm(config, "transactions", pages)
+
+    assert requests == [("small", pages), ("large", [pages[1], pages[2]])]
+    assert [txn.note for txn in transactions] == ["SWIGGY", "ZOMATO LARGE", "UBER LARGE", "AMAZON"]
+    summary = message.split("\n\n")[0].split("\n ")
+    assert summary[0] == "Packed 4 pages into 4 requests, 2 served by small, 2 escalated to large"
+    assert summary[1].startswith("page 1: small (confidence 0.95") and "escalated" not in summary[1]
+    assert summary[2].startswith("page 2: small (confidence 0.5,") and summary[2].endswith("-> escalated to large")
+    assert summary[3].startswith("page 3: small (confidence 0.95") and summary[3].endswith("-> escalated to large")
+    assert summary[4].startswith("page 4: small") and "escalated" not in summary[4]
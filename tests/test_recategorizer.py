@@ -0,0 +1,20 @@
+from domain.category_rule import CategoryRule
+from modules.recategorizer import recategorize_rows
+
+
+def row(amount, note="UPI/SWIGGY", category="MISC"):
+    return ["run", "m1", "hdfc_bank", 45839, "DEBIT", category, amount, note]
+
+
+def test_unreadable_amounts_fail_min_and_max():
+    rules = [
+        CategoryRule(priority=1, max_amount=100, category="FUN"),
+        CategoryRule(priority=2, min_amount=1000, category="LIVING"),
+    ]
+    rows = [row("n/a"), row(""), row(50), row(25000.5), row("1,234.00")]
+    assert recategorize_rows(rules, rows) == [(2, "FUN"), (3, "LIVING"), (4, "LIVING")]
+
+
+def test_unbounded_rules_still_match_unreadable_amounts():
+    rules = [CategoryRule(priority=1, note_contains="swiggy", category="FUN")]
+    assert recategorize_rows(rules, [row("n/a"), row(12, note="ATM")]) == [(0, "FUN")]
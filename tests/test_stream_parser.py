@@ -0,0 +1,58 @@
+import json
+import pytest
+from modules.field_parser.stream_parser import ArrayItemStreamParser
+
+OUTPUTS = {
+    "escaped_quotes": {
+        "transactions": [
+            {"date": "2025-06-01", "amount": 500.0, "note": "UPI \"SWIGGY\" ORDER", "txn_type": "DEBIT"},
+            {"date": "2025-06-02", "amount": 20.5, "note": "ends with a backslash \\", "txn_type": "DEBIT"},
+        ],
+        "confidence": 0.9,
+    },
+    "braces_and_brackets_in_strings": {
+        "transactions": [
+            {"date": "2025-06-01", "amount": 1.0, "note": "REF {123} [A] }]{[", "txn_type": "CREDIT"},
+            {"date": "2025-06-03", "amount": 2.0, "note": "\"}\" and \"]\"", "txn_type": "DEBIT"},
+        ],
+        "confidence": 0.8,
+    },
+    "transactions_as_a_value": {
+        "kind": "transactions",
+        "other": [{"date": "2025-01-01", "amount": 9.0}],
+        "transactions": [
+            {"date": "2025-06-01", "amount": 3.0, "note": "transactions", "txn_type": "DEBIT"},
+        ],
+    },
+    "confidence_first": {
+        "confidence": 0.75,
+        "transactions": [
+            {"date": "2025-06-01", "amount": 4.0, "note": "NEFT", "txn_type": "CREDIT", "tags": [{"a": [1, 2]}]},
+            {"date": "2025-06-02", "amount": 5.0, "note": "IMPS", "txn_type": "DEBIT"},
+        ],
+    },
+}
+
+
+def stream(text, chunk_size):
+    parser = ArrayItemStreamParser("transactions")
+    items = []
+    for i in range(0, len(text), chunk_size):
+        items.extend(parser.feed(text[i:i + chunk_size]))
+    return items
+
+
+@pytest.mark.parametrize("name", OUTPUTS)
+@pytest.mark.parametrize("chunk_size", [1, 3, 7, 10_000])
+@pytest.mark.parametrize("indent", [None, 2])
+def test_streamed_items_match_the_parsed_output(name, chunk_size, indent):
+    text = json.dumps(OUTPUTS[name], indent=indent)
+    assert stream(text, chunk_size) == json.loads(text)["transactions"]
+
+
+def test_items_are_returned_as_soon_as_they_close():
+    text = json.dumps(OUTPUTS["confidence_first"])
+    first_end = text.index('"IMPS"')
+    parser = ArrayItemStreamParser("transactions")
+    assert parser.feed(text[:first_end]) == OUTPUTS["confidence_first"]["transactions"][:1]
+    assert parser.feed(text[first_end:]) == OUTPUTS["confidence_first"]["transactions"][1:]
@@ -0,0 +1,38 @@
+from datetime import date
+from domain.email_config import EmailConfig
+from modules.email_service import build_query
+from modules.sync_state import checkpoint_key, get_history_checkpoint, save_history_checkpoint
+
+START, END = date(2025, 6, 1), date(2025, 7, 1)
+
+
+def config(id: str, sender: str = "cards@bank.example", keywords=("statement",)) -> EmailConfig:
+    return EmailConfig(id=id, from_addresses=[sender], subject_keywords=list(keywords), field_parsers={}, run=True)
+
+
+def key(configs) -> str:
+    return checkpoint_key(build_query(START, END, configs), configs)
+
+
+def test_config_reusing_a_sender_changes_the_key():
+    configs = [config("card_a")]
+    with_new_config = configs + [config("card_b")]
+    assert build_query(START, END, configs) == build_query(START, END, with_new_config)
+    assert key(configs) != key(with_new_config)
+
+
+def test_subject_keyword_edit_changes_the_key():
+    assert key([config("card_a")]) != key([config("card_a", keywords=("e-statement",))])
+
+
+def test_key_ignores_config_order_and_disabled_configs():
+    disabled = config("card_c")
+    disabled.run = False
+    assert key([config("card_a"), config("card_b")]) == key([config("card_b"), config("card_a"), disabled])
+
+
+def test_checkpoint_round_trip(tmp_path):
+    path = str(tmp_path / "state" / "state.json")
+    save_history_checkpoint(key([config("card_a")]), "123", path)
+    assert get_history_checkpoint(key([config("card_a")]), path) == "123"
+    assert get_history_checkpoint(key([config("card_a"), config("card_b")]), path) is None
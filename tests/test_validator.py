@@ -0,0 +1,97 @@
+import time
+import random
+from datetime import date, timedelta
+from itertools import permutations
+from domain.transaction import Transaction
+from modules.validator import compare_transactions, min_cost_assignment
+
+
+def brute_force_cost(cost):
+    rows, columns = len(cost), len(cost[0])
+    if rows <= columns:
+        return min(sum(cost[i][j] for i, j in enumerate(chosen)) for chosen in permutations(range(columns), rows))
+    return min(sum(cost[i][j] for j, i in enumerate(chosen)) for chosen in permutations(range(rows), columns))
+
+
+def test_min_cost_assignment_is_optimal():
+    rng = random.Random(0)
+    for _ in range(200):
+        rows, columns = rng.randint(1, 5), rng.randint(1, 5)
+        cost = [[rng.choice([rng.random(), float(rng.randint(0, 3))]) for _ in range(columns)] for _ in range(rows)]
+        pairs = min_cost_assignment(cost)
+        assert len(pairs) == min(rows, columns)
+        assert len({i for i, _ in pairs}) == len({j for _, j in pairs}) == len(pairs)
+        assert abs(sum(cost[i][j] for i, j in pairs) - brute_force_cost(cost)) < 1e-9
+
+
+def test_min_cost_assignment_empty():
+    assert min_cost_assignment([]) == []
+    assert min_cost_assignment([[]]) == []
+
+
+def rows(count: int, seed: int = 0):
+    rng = random.Random(seed)
+    return [
+        {
+            "date": (date(2025, 6, 1) + timedelta(days=i * 28 // count)).isoformat(),
+            "amount": round(rng.uniform(10, 50000), 2),
+            "note": f"UPI/MERCHANT {rng.randint(0, 40)}/{rng.randint(100000, 999999)}",
+            "txn_type": rng.choice(["DEBIT", "CREDIT"]),
+        }
+        for i in range(count)
+    ]
+
+
+def generated(expected):
+    return [Transaction(**tx, category="MISC", reason="test") for tx in expected]
+
+
+def test_identical_transactions_have_no_mismatches():
+    expected = rows(50)
+    assert compare_transactions(expected, generated(expected[::-1])) == []
+
+
+def test_missing_and_extra_rows():
+    expected = rows(20)
+    extra = {"date": "2025-06-30", "amount": 1.0, "note": "NEW ROW", "txn_type": "DEBIT"}
+    mismatches = compare_transactions(expected, generated(expected[:5] + expected[6:] + [extra]))
+    assert [m for m in mismatches if m.startswith("Missing")] == [f"Missing row 5 → expected date={expected[5]['date']}, amount={expected[5]['amount']}, type={expected[5]['txn_type']}, note='{expected[5]['note']}'"]
+    assert [m for m in mismatches if m.startswith("Extra")] == ["Extra row → generated date=2025-06-30, amount=1.0, type=DEBIT, note='NEW ROW'"]
+    assert not any(m.startswith("Changed") or m.startswith("Transaction count") for m in mismatches)
+
+
+def test_shifted_dates_are_reported_as_changed_rows():
+    expected = rows(200)
+    shifted = [dict(tx, date=(date.fromisoformat(tx["date"]) + timedelta(days=1)).isoformat()) for tx in expected]
+    mismatches = compare_transactions(expected, generated(shifted))
+    assert len(mismatches) == len(expected)
+    assert all(m.startswith(f"Changed row {row} on 'date'") for row, m in enumerate(mismatches))
+
+
+def test_one_changed_field_or_note_is_a_changed_row():
+    expected = rows(10)
+    changed = [dict(tx) for tx in expected]
+    changed[2]["amount"] += 1
+    changed[4]["txn_type"] = "CREDIT" if changed[4]["txn_type"] == "DEBIT" else "DEBIT"
+    changed[7]["note"] = "SOMETHING ELSE ENTIRELY"
+    mismatches = compare_transactions(expected, generated(changed))
+    assert [m.split(" → ")[0].split(":")[0] for m in mismatches] == [
+        "Changed row 2 on 'amount'", "Changed row 4 on 'txn_type'", "Changed row 7",
+    ]
+    assert "note similarity" in mismatches[2]
+
+
+def test_two_changed_fields_are_missing_and_extra():
+    expected = rows(5)
+    changed = [dict(tx) for tx in expected]
+    changed[1].update(amount=changed[1]["amount"] + 1, date="2025-07-15")
+    mismatches = compare_transactions(expected, generated(changed))
+    assert [m.split(" → ")[0] for m in mismatches] == ["Missing row 1", "Extra row"]
+
+
+def test_shifted_dates_scale():
+    expected = rows(3000)
+    shifted = [dict(tx, date=(date.fromisoformat(tx["date"]) + timedelta(days=1)).isoformat()) for tx in expected]
+    started = time.perf_counter()
+    assert len(compare_transactions(expected, generated(shifted))) == len(expected)
+    assert time.perf_counter() - started < 10
@@ -0,0 +1,64 @@
+import random
+import pytest
+from modules.field_parser.field_parser_utils import is_float
+from modules.field_parser.word_index import PageWordIndex
+
+LOCATIONS = ["RIGHT", "LEFT", "BELOW", "ABOVE"]
+
+
+def reference_nearest(words, location, x0, x1, top, bottom):
+    """The word loop extract_float_near_keyword_from_pdf used before PageWordIndex."""
+    x_center, y_center = (x0 + x1) / 2, (top + bottom) / 2
+    candidates = []
+    for word in words:
+        if not is_float(word['text']):
+            continue
+        w_x_center = (float(word['x0']) + float(word['x1'])) / 2
+        w_y_center = (float(word['top']) + float(word['bottom'])) / 2
+        is_valid = (
+            (location == "RIGHT" and w_x_center > x1 and abs(w_y_center - y_center) <= 5)
+            or (location == "LEFT" and w_x_center < x0 and abs(w_y_center - y_center) <= 5)
+            or (location == "BELOW" and w_y_center > bottom and abs(w_x_center - x_center) <= 30)
+            or (location == "ABOVE" and w_y_center < top and abs(w_x_center - x_center) <= 30)
+        )
+        if is_valid:
+            candidates.append((((w_x_center - x_center) ** 2 + (w_y_center - y_center) ** 2) ** 0.5, word['text']))
+    return sorted(candidates, key=lambda candidate: candidate[0])[0] if candidates else None
+
+
+def random_words(rng: random.Random, count: int):
+    words = []
+    for _ in range(count):
+        # A coarse grid makes equal distances (ties) common
+        x0, top = rng.randrange(0, 300, 5), rng.randrange(0, 300, 4)
+        text = rng.choice([f"{rng.uniform(0, 99999):,.2f}", "Balance", "Total", "Dr", str(rng.randint(0, 999)), "-"])
+        words.append({"text": text, "x0": x0, "x1": x0 + rng.choice([10, 20, 30]), "top": top, "bottom": top + rng.choice([6, 8])})
+    return words
+
+
+def test_nearest_numeric_matches_the_word_loop():
+    rng = random.Random(0)
+    for _ in range(300):
+        words = random_words(rng, rng.randint(0, 60))
+        index = PageWordIndex(words)
+        for _ in range(10):
+            x0, top = rng.randrange(0, 300, 5), rng.randrange(0, 300, 4)
+            box = dict(x0=float(x0), x1=float(x0 + rng.choice([10, 25])), top=float(top), bottom=float(top + 8))
+            location = rng.choice(LOCATIONS)
+            actual, expected = index.nearest_numeric(location, **box), reference_nearest(words, location, **box)
+            # The extractor only uses the text; distances may differ in the last bit (np.sqrt vs ** 0.5)
+            assert (actual is None) == (expected is None)
+            if expected:
+                assert actual[1] == expected[1] and actual[0] == pytest.approx(expected[0])
+
+
+def test_find_phrase_matches_the_word_scan():
+    rng = random.Random(1)
+    for _ in range(200):
+        words = [{"text": rng.choice(["Total", "AMOUNT", "due", "Due", "x"])} for _ in range(rng.randint(0, 30))]
+        parts = [rng.choice(["total", "amount", "due"]) for _ in range(rng.randint(1, 3))]
+        expected = [
+            i for i in range(len(words) - len(parts) + 1)
+            if all(words[i + j]['text'].lower() == parts[j] for j in range(len(parts)))
+        ]
+        assert PageWordIndex(words).find_phrase(parts) == expected